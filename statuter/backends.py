@@ -0,0 +1,82 @@
+from xml.parsers import expat
+from xml.sax import make_parser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+EXPAT_BUFFER_SIZE = 2 ** 20
+
+
+class SaxBackend(object):
+    """Feeds the document through xml.sax, calling the content handler's SAX callbacks."""
+
+    def __init__(self, content_handler):
+        self._parser = make_parser()
+        self._parser.setContentHandler(content_handler)
+
+    def feed(self, data):
+        self._parser.feed(data)
+
+
+class ExpatBackend(object):
+    """Binds the content handler's callbacks straight to a pyexpat parser.
+
+    This skips the SAX driver's per-event wrapping and attribute objects, and buffers
+    character data so each element's text arrives in one call.
+    """
+
+    def __init__(self, content_handler):
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.buffer_size = EXPAT_BUFFER_SIZE
+        self._parser.StartElementHandler = content_handler.startElement
+        self._parser.EndElementHandler = content_handler.endElement
+        self._parser.CharacterDataHandler = content_handler.characters
+
+    def feed(self, data):
+        self._parser.Parse(data, False)
+
+
+class LxmlBackend(object):
+    """Replays lxml pull-parser events to the content handler, discarding elements once read."""
+
+    def __init__(self, content_handler):
+        if etree is None:
+            raise ImportError('The lxml backend requires lxml to be installed')
+        self._parser = etree.XMLPullParser(events=('start', 'end'))
+        self._handler = content_handler
+
+    def feed(self, data):
+        self._parser.feed(data)
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._handler.startElement(element.tag, element.attrib)
+                continue
+
+            if element.text is not None:
+                self._handler.characters(element.text)
+            self._handler.endElement(element.tag)
+
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+BACKENDS = {
+    'sax': SaxBackend,
+    'expat': ExpatBackend,
+    'lxml': LxmlBackend,
+}
+
+
+def make_backend(name, content_handler):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError('Unknown parse backend {}, expected one of {}'.format(name, ', '.join(sorted(BACKENDS))))
+    return backend(content_handler)
@@ -0,0 +1,229 @@
+import collections
+import csv
+import itertools
+import os
+import time
+import functools
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from statuter import sources
+from statuter.block import LayoutTemplate, Page
+from statuter.cache import input_hash
+from statuter.index import PageIndex
+from statuter.loader import render_chunks, write_acts
+from statuter.profiler import PageStats
+
+
+DEFAULT_MAX_PAGES_IN_FLIGHT = 64
+DEFAULT_MAX_BYTES_IN_FLIGHT = 256 * 2 ** 20
+
+Volume = collections.namedtuple('Volume', ['path', 'toc', 'english', 'french'])
+# characters is the page's count from the index catalog, which tasks are scheduled by;
+# source_hash keys the volume's pages in the page cache, if there is one
+PageTask = collections.namedtuple('PageTask', ['volume_no', 'path', 'page_no', 'header_end',
+                                               'start', 'end', 'backend', 'characters',
+                                               'source_hash'])
+
+# each process carries margins between the pages it lays out when layout is reused
+_layout_template = None
+
+
+def page_range(pages):
+    pages = [int(page) for page in pages.split('-')]
+    return range(pages[0], pages[1] + 1)
+
+
+def read_toc(toc_path, english_dir, french_dir):
+    """Return the (english_output, french_output, pages) acts of a table of contents CSV."""
+    with open(toc_path, 'r') as toc_file:
+        return [(os.path.join(english_dir, act['Chapter'] + '.md'),
+                 os.path.join(french_dir, act['Chapter'] + '.md'),
+                 page_range(act['Pages'])) for act in csv.DictReader(toc_file)]
+
+
+def read_volumes(batch_path):
+    """Read a batch CSV with Volume, TOC, English and French columns.
+
+    Relative paths are taken relative to the batch file.
+    """
+    directory = os.path.dirname(os.path.abspath(batch_path))
+    with open(batch_path, 'r') as batch_file:
+        return [Volume(*[os.path.join(directory, row[column])
+                         for column in ('Volume', 'TOC', 'English', 'French')])
+                for row in csv.DictReader(batch_file)]
+
+
+def render_task(task, cache=None, reuse_layout=False, profile=False):
+    """Return (page_no, english_markdown, french_markdown, stats) for one page, reading only its
+    bytes and the file header.
+
+    The page goes through statuter.loader.render_chunks, so it is looked up in and added to
+    cache, laid out with this process's LayoutTemplate if reuse_layout, and profiled if
+    profile; stats is None otherwise. A page with too few characters to be laid out is
+    rendered blank without being read.
+    """
+    global _layout_template
+    if task.characters < Page.MIN_WORDS:
+        stats = None
+        if profile:
+            stats = PageStats()
+            stats.count('characters', task.characters)
+            stats.count('skipped_pages', 1)
+        return task.page_no, '', '', stats
+
+    if reuse_layout and _layout_template is None:
+        _layout_template = LayoutTemplate()
+    rendered = render_chunks(_task_chunks(task), task.page_no, task.backend, cache,
+                             task.source_hash, _layout_template if reuse_layout else None,
+                             profile)
+    if rendered is None:
+        return task.page_no, '', '', None
+    page, english_markdown, french_markdown = rendered
+    return page.page_no, english_markdown, french_markdown, page.stats
+
+
+def _task_chunks(task):
+    with open(task.path, 'rb') as xml_file:
+        yield xml_file.read(task.header_end)
+        xml_file.seek(task.start)
+        yield xml_file.read(task.end - task.start)
+
+
+def _volume_tasks(volume_no, index, acts, backend, source_hash=None):
+    pages = sorted(set(page_no for _, _, act_pages in acts for page_no in act_pages))
+    for page_no in pages:
+        if page_no in index:
+            start, end = index.offsets(page_no)
+            yield PageTask(volume_no, index.path, str(page_no), index.header_end, start, end,
+                           backend, index.stats[str(page_no)].characters, source_hash)
+
+
+def _resolved(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def schedule(tasks, executor=None, max_pages=DEFAULT_MAX_PAGES_IN_FLIGHT,
+             max_bytes=DEFAULT_MAX_BYTES_IN_FLIGHT, workers=None, render=render_task):
+    """Yield (task, render(task)) for each task, in task order.
+
+    Tasks are read ahead until max_pages of them, or max_bytes of page XML, are waiting to be
+    yielded; the oldest is then waited for before reading more. A page larger than max_bytes
+    is still run, alone. Whenever fewer than workers tasks are running on executor, the
+    waiting task with the most characters is submitted next, so that dense pages start
+    early rather than finishing alone at the end; the oldest is submitted regardless once
+    it is due. Without workers, tasks are submitted as soon as they are read. Pages too
+    sparse to lay out are rendered here rather than by the executor. Without an executor,
+    tasks run inline.
+    """
+    if executor is None:
+        for task in tasks:
+            yield task, render(task)
+        return
+
+    # [task, future] for each task read, in task order; future is None until submitted
+    window = collections.deque()
+    running = set()
+    bytes_in_window = 0
+    tasks = iter(tasks)
+    task = next(tasks, None)
+    while task is not None or window:
+        while task is not None and (not window or (
+                len(window) < max_pages and bytes_in_window + task.end - task.start <= max_bytes)):
+            sparse = task.characters < Page.MIN_WORDS
+            window.append([task, _resolved(render(task)) if sparse else None])
+            bytes_in_window += task.end - task.start
+            task = next(tasks, None)
+
+        running = set(future for future in running if not future.done())
+        waiting = sorted((entry for entry in window if entry[1] is None),
+                         key=lambda entry: entry[0].characters, reverse=True)
+        if workers is not None:
+            waiting = waiting[:max(workers - len(running), 0)]
+        oldest = window[0]
+        if oldest[1] is None and not any(entry is oldest for entry in waiting):
+            waiting.append(oldest)
+        for entry in waiting:
+            entry[1] = executor.submit(render, entry[0])
+            running.add(entry[1])
+
+        if not oldest[1].done():
+            wait(running, return_when=FIRST_COMPLETED)
+            continue
+        window.popleft()
+        bytes_in_window -= oldest[0].end - oldest[0].start
+        yield oldest[0], oldest[1].result()
+
+
+def _written_pages(results, counted, profiler=None):
+    for _, (page_no, english_markdown, french_markdown, stats) in results:
+        counted['pages'] += 1
+        if profiler is not None and stats is not None:
+            profiler.add_page(page_no, stats)
+        yield page_no, [english_markdown], [french_markdown]
+
+
+def run_batch(volumes, workers=1, backend='sax', max_pages=DEFAULT_MAX_PAGES_IN_FLIGHT,
+              max_bytes=DEFAULT_MAX_BYTES_IN_FLIGHT, cache=None, profiler=None,
+              reuse_layout=False):
+    """Extract the acts of every Volume, scheduling their pages on one shared worker pool.
+
+    Volumes must be uncompressed, since workers read their pages through the page index.
+    Pages are rendered as by render_task with cache, reuse_layout and, with a
+    statuter.profiler.Profiler, profiling, whose page stats are added to profiler.
+    Returns a dict with the number of volumes, acts and pages, the elapsed seconds and
+    the pages per second.
+    """
+    start = time.perf_counter()
+    volume_acts, tasks = [], []
+    for volume_no, volume in enumerate(volumes):
+        if not sources.is_plain_file(volume.path):
+            raise ValueError('Batch volumes must be uncompressed XML: {}'.format(volume.path))
+        for directory in (volume.english, volume.french):
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+        toc = read_toc(volume.toc, volume.english, volume.french)
+        acts = [(english_output, french_output, list(pages))
+                for english_output, french_output, pages in toc]
+        volume_acts.append(acts)
+        source_hash = input_hash(volume.path) if cache is not None else None
+        tasks.append(_volume_tasks(volume_no, PageIndex.for_file(volume.path), acts, backend,
+                                   source_hash))
+
+    print("Beginning {} volumes".format(len(volumes)))
+    pages = 0
+    written = set()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        render = functools.partial(render_task, cache=cache, reuse_layout=reuse_layout,
+                                   profile=profiler is not None)
+        results = schedule(itertools.chain.from_iterable(tasks), executor, max_pages, max_bytes,
+                           workers if executor is not None else None, render)
+        by_volume = itertools.groupby(results, key=lambda result: result[0].volume_no)
+        for volume_no, volume_results in by_volume:
+            counted = collections.Counter()
+            write_acts(volume_acts[volume_no], _written_pages(volume_results, counted, profiler))
+            written.add(volume_no)
+            pages += counted['pages']
+            print("Finished volume {}".format(volumes[volume_no].path))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for volume_no, acts in enumerate(volume_acts):
+        if volume_no not in written:
+            write_acts(acts, [])
+    if cache is not None:
+        cache.evict()
+
+    seconds = time.perf_counter() - start
+    report = {
+        'volumes': len(volumes),
+        'acts': sum(len(acts) for acts in volume_acts),
+        'pages': pages,
+        'seconds': seconds,
+        'pages_per_second': pages / seconds if seconds > 0 else 0.0,
+    }
+    print("Finished {pages} pages from {volumes} volumes in {seconds:.1f} s "
+          "({pages_per_second:.1f} pages/s)".format(**report))
+    return report
@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from statuter.backends import make_backend
+from statuter.block import Page
+from statuter.index import PageIndex
+from statuter.loader import RscLoader, DocumentFinishedException
+from statuter import synthetic
+
+
+STAGES = ('parse', 'words', 'compute_column_margins', 'remove_troublesome_lines', 'extract_language',
+          'markdown')
+DEFAULT_TOLERANCE = 0.25
+# characters per page of the generated volumes that run_scaling_benchmark compares
+DEFAULT_SCALING_CHARS = (1000, 2000, 4000, 8000, 16000)
+
+
+class _CharacterCollector(RscLoader):
+    """Parses a page into Character objects without assembling them into words."""
+
+    def __init__(self, page_numbers):
+        RscLoader.__init__(self, page_numbers)
+        self.collected = []
+
+    def _add_character(self, character):
+        self.collected.append(character)
+
+
+class _StageTimer(object):
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.seconds = {stage: [] for stage in STAGES}
+        self.peak_bytes = {stage: 0 for stage in STAGES}
+
+    def run(self, stage, function, *args):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = function(*args)
+        self.seconds[stage].append(time.perf_counter() - start)
+        if self.memory:
+            self.peak_bytes[stage] = max(self.peak_bytes[stage], tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return result
+
+
+def _parse(index, page_id, backend):
+    collector = _CharacterCollector([page_id])
+    parser = make_backend(backend, collector)
+    chunks = index.read_chunks([page_id])
+    for chunk in chunks:
+        try:
+            parser.feed(chunk)
+        except DocumentFinishedException:
+            chunks.close()
+    return collector.page, collector.collected
+
+
+def _assemble_words(page, characters):
+    assembler = RscLoader([page.page_no])
+    assembler.page = page
+    for character in characters:
+        assembler._add_character(character)
+    return page
+
+
+def _render(page):
+    english, french = page._extract_languages()
+    return page.convert_to_markdown(english), page.convert_to_markdown(french)
+
+
+def run_benchmark(path, page_ids=None, backend='sax', memory=False):
+    """Time each stage of extracting every page (or page_ids) of the volume at path.
+
+    With memory, each stage also runs under tracemalloc and records its peak allocation,
+    which slows the timings down; the two are best measured in separate runs.
+    """
+    index = PageIndex.for_file(path)
+    if page_ids is None:
+        page_ids = [page_id for page_id, _, _ in index.pages]
+
+    timer = _StageTimer(memory)
+    characters, words, laid_out = 0, 0, 0
+    for page_id in page_ids:
+        page, page_characters = timer.run('parse', _parse, index, page_id, backend)
+        timer.run('words', _assemble_words, page, page_characters)
+        characters += len(page_characters)
+        words += len(page.words)
+        if len(page.words) < Page.MIN_WORDS:
+            continue
+
+        laid_out += 1
+        timer.run('compute_column_margins', page.compute_column_margins)
+        timer.run('remove_troublesome_lines', page.remove_troublesome_lines)
+        timer.run('extract_language', page._extract_languages)
+        timer.run('markdown', _render, page)
+
+    stages = {}
+    for stage in STAGES:
+        seconds = timer.seconds[stage]
+        stages[stage] = {
+            'seconds': sum(seconds),
+            'max_page_seconds': max(seconds) if seconds else 0.0,
+        }
+        if memory:
+            stages[stage]['peak_bytes'] = timer.peak_bytes[stage]
+
+    return {
+        'input': os.path.basename(path),
+        'backend': backend,
+        'pages': len(page_ids),
+        'laid_out_pages': laid_out,
+        'characters': characters,
+        'words': words,
+        'stages': stages,
+    }
+
+
+def run_synthetic_benchmark(pages=20, chars_per_page=3000, fonts=('Courier', 'Times-Roman'),
+                            running_headers=True, seed=0, backend='sax', memory=False):
+    directory = tempfile.mkdtemp(prefix='statuter-bench-')
+    try:
+        path = synthetic.write_volume(os.path.join(directory, 'volume.xml'), pages, chars_per_page, fonts,
+                                      running_headers, seed)
+        results = run_benchmark(path, backend=backend, memory=memory)
+    finally:
+        shutil.rmtree(directory)
+
+    results['volume'] = {
+        'pages': pages,
+        'chars_per_page': chars_per_page,
+        'fonts': list(fonts),
+        'running_headers': running_headers,
+        'seed': seed,
+    }
+    return results
+
+
+def run_scaling_benchmark(chars_per_page=DEFAULT_SCALING_CHARS, pages=5,
+                          fonts=('Courier', 'Times-Roman'), running_headers=True, seed=0,
+                          backend='sax'):
+    """Run the synthetic benchmark once for each number of chars_per_page, in order.
+
+    Returns the results of each run, with every stage's seconds_per_character added. A stage
+    whose work is linear in the characters on a page takes about as long per character on
+    the largest pages as on the smallest.
+    """
+    runs = []
+    for page_characters in chars_per_page:
+        results = run_synthetic_benchmark(pages, page_characters, fonts, running_headers, seed,
+                                          backend)
+        for timing in results['stages'].values():
+            timing['seconds_per_character'] = timing['seconds'] / max(results['characters'], 1)
+        runs.append(results)
+    return runs
+
+
+def save_baseline(results, path):
+    with open(path, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path, 'r') as baseline_file:
+        return json.load(baseline_file)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return (stage, baseline_seconds, seconds) for each stage more than tolerance slower.
+
+    Stage times are compared per character so that baselines taken on a different number
+    of pages still apply.
+    """
+    regressions = []
+    for stage in STAGES:
+        baseline_seconds = baseline['stages'][stage]['seconds']
+        seconds = results['stages'][stage]['seconds']
+        scale = float(results['characters']) / max(baseline['characters'], 1)
+        if baseline_seconds > 0 and seconds > baseline_seconds * scale * (1 + tolerance):
+            regressions.append((stage, baseline_seconds * scale, seconds))
+    return regressions
+
+
+def format_results(results):
+    lines = ['{} pages, {} characters, {} words ({} backend)'.format(
+        results['pages'], results['characters'], results['words'], results['backend'])]
+    for stage in STAGES:
+        timing = results['stages'][stage]
+        line = '{:<26}{:>10.3f} s{:>10.2f} ms max/page'.format(stage, timing['seconds'],
+                                                               timing['max_page_seconds'] * 1000)
+        if 'peak_bytes' in timing:
+            line += '{:>10.1f} KiB peak'.format(timing['peak_bytes'] / 1024.0)
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def format_scaling(runs):
+    lines = ['{:<26}'.format('us/character at chars/page') +
+             ''.join('{:>10}'.format(run['volume']['chars_per_page']) for run in runs)]
+    for stage in STAGES:
+        microseconds = [run['stages'][stage]['seconds_per_character'] * 1e6 for run in runs]
+        lines.append('{:<26}'.format(stage) + ''.join('{:>10.3f}'.format(us) for us in microseconds))
+    return '\n'.join(lines)
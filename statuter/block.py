@@ -1,10 +1,24 @@
-import io
+import bisect
+import itertools
 import os
 import re
 import string
+from statuter.profiler import timed
+
+
+HEADER_PATTERN = re.compile(r'^(\d+\.)(.*)')
+LETTER_PARAGRAPH_PATTERN = re.compile(r'^^\(([a-z]+)\)( .*)')
+
+# how Page renders a line to markdown
+LINE_TEXT, LINE_HEADER_1, LINE_HEADER_2, LINE_SECTION, LINE_PARAGRAPH = \
+    'text', 'header_1', 'header_2', 'section', 'paragraph'
+LINE_KINDS = (LINE_TEXT, LINE_HEADER_1, LINE_HEADER_2, LINE_SECTION, LINE_PARAGRAPH)
 
 
 class Character(object):
+
+    __slots__ = ('text', 'left', 'right', 'top', 'bottom', 'size', 'font')
+
     def __init__(self, left, right, bottom, top, text='', size=5.0, font='Courier'):
         self.text = text
         self.left = left
@@ -25,48 +39,93 @@ class Word(object):
     MAX_HORIZONTAL_SPACING = 0.01
     MIN_VERTICAL_OVERLAP_FRACTION = 0.95
 
+    # Characters are folded into the running aggregates below and only their text is
+    # kept, so a word's memory does not grow with a Character object per letter.
+    __slots__ = ('_texts', '_left', '_right', '_bottom', '_top', '_total_size',
+                 '_caps', '_non_caps', '_fonts', '_mode_font')
+
     def __init__(self):
-        self._characters = []
+        self._texts = []
+        self._left, self._right = None, None
+        self._bottom, self._top = None, None
+        self._total_size = 0.0
+        self._caps, self._non_caps = 0, 0
+        self._fonts = {}
+        self._mode_font = None
 
     def add_character(self, character):
         if self.can_add(character):
-            self._characters.append(character)
+            self._texts.append(character.text)
+            self._update_aggregates(character)
             return True
         else:
             return False
 
+    def _update_aggregates(self, character):
+        if len(self._texts) == 1:
+            self._left, self._right = character.left, character.right
+            self._bottom, self._top = character.bottom, character.top
+        else:
+            self._left = min(self._left, character.left)
+            self._right = max(self._right, character.right)
+            self._bottom = min(self._bottom, character.bottom)
+            self._top = max(self._top, character.top)
+
+        self._total_size += character.size
+        self._caps += character.text in string.ascii_uppercase
+        self._non_caps += character.text in string.ascii_lowercase
+
+        # font counts only grow, so the mode is either unchanged or the font just counted
+        count = self._fonts.get(character.font, 0) + 1
+        self._fonts[character.font] = count
+        if self._mode_font is None or (-count, character.font) < (-self._fonts[self._mode_font], self._mode_font):
+            self._mode_font = character.font
+
+    def state(self):
+        """Return the word's accumulated state as plain values, for serialization."""
+        return (list(self._texts), self._left, self._right, self._bottom, self._top, self._total_size,
+                self._caps, self._non_caps, dict(self._fonts), self._mode_font)
+
+    @classmethod
+    def from_state(cls, state):
+        word = cls()
+        (texts, word._left, word._right, word._bottom, word._top, word._total_size,
+         word._caps, word._non_caps, fonts, word._mode_font) = state
+        word._texts, word._fonts = list(texts), dict(fonts)
+        return word
+
     def vertical_overlap_fraction(self, chararacter):
         intersection_length = min(self.top, chararacter.top) - max(self.bottom, chararacter.bottom)
         return max(intersection_length / self.height, intersection_length / chararacter.height)
 
     def can_add(self, character):
-        return self._characters == [] or \
+        return self._texts == [] or \
                (-self.MAX_HORIZONTAL_OVERLAP <= (character.left - self.right) <= self.MAX_HORIZONTAL_SPACING and
                 self.vertical_overlap_fraction(character) >= self.MIN_VERTICAL_OVERLAP_FRACTION)
 
     @property
     def text(self):
-        return ''.join([char.text for char in self._characters])
+        return ''.join(self._texts)
 
     @property
     def num_chars(self):
-        return len(self._characters)
+        return len(self._texts)
 
     @property
     def left(self):
-        return min([char.left for char in self._characters])
+        return self._left
 
     @property
     def right(self):
-        return max([char.right for char in self._characters])
+        return self._right
 
     @property
     def top(self):
-        return max([char.top for char in self._characters])
+        return self._top
 
     @property
     def bottom(self):
-        return min([char.bottom for char in self._characters])
+        return self._bottom
 
     @property
     def height(self):
@@ -74,34 +133,135 @@ class Word(object):
 
     @property
     def mean_size(self):
-        total_size = sum([char.size for char in self._characters])
-        return total_size / len(self._characters)
+        return self._total_size / len(self._texts)
 
     @property
     def fraction_capitalized(self):
-        caps = [char for char in self._characters if char.text in string.ascii_uppercase]
-        non_caps = [char for char in self._characters if char.text in string.ascii_lowercase]
-        total = len(caps) + len(non_caps)
+        total = self._caps + self._non_caps
         if total == 0:
             return 1.0
         else:
-            return float(len(caps)) / total
+            return float(self._caps) / total
 
     @property
     def mode_font(self):
-        fonts = {}
-        for char in self._characters:
-            fonts[char.font] = fonts.get(char.font, 0) + 1
-
-        font, _ = sorted(fonts.items(), key=lambda f: (-f[1], f[0]))[0]
-        return font
+        return self._mode_font
 
     def __repr__(self):
         return self.text
 
 
+class WordIndex(object):
+    """A page's words sorted by edge, for bbox range queries that only touch candidate words.
+
+    A query bisects one sorted edge for its candidates and checks its other bounds on those
+    alone. Overlap queries widen the left edge range by the widest word, so that words
+    starting before the region but reaching into it are still candidates. Edges are sorted
+    on first use, and results keep the words' page order.
+    """
+
+    # added to the overlap widening so float rounding of word widths can't drop a candidate
+    WIDTH_SLACK = 1e-6
+
+    def __init__(self, words):
+        self.words = words
+        self._edges = {}
+        self._max_width = None
+
+    def _sorted_edge(self, edge):
+        if edge not in self._edges:
+            values = [getattr(word, edge) for word in self.words]
+            order = sorted(range(len(values)), key=values.__getitem__)
+            self._edges[edge] = ([values[i] for i in order], order)
+        return self._edges[edge]
+
+    def _between(self, edge, low, high, strict=False):
+        values, order = self._sorted_edge(edge)
+        if strict:
+            start, stop = bisect.bisect_right(values, low), bisect.bisect_left(values, high)
+        else:
+            start, stop = bisect.bisect_left(values, low), bisect.bisect_right(values, high)
+        return [self.words[i] for i in sorted(order[start:stop])]
+
+    @property
+    def max_width(self):
+        if self._max_width is None:
+            self._max_width = max([word.right - word.left for word in self.words] or [0.0])
+        return self._max_width
+
+    def with_bottom(self, low, high):
+        """Words whose bottom edge is from low to high inclusive."""
+        return self._between('bottom', low, high)
+
+    def inside(self, left, right, bottom, top, strict=False):
+        """Words lying within the region; with strict, words touching its sides are left out."""
+        candidates = self._between('left', left, right, strict)
+        if strict:
+            return [word for word in candidates if word.right < right and word.bottom > bottom and word.top < top]
+        return [word for word in candidates if word.right <= right and word.bottom >= bottom and word.top <= top]
+
+    def overlapping(self, left, right, bottom, top):
+        """Words with any part in the region, including words touching its sides."""
+        candidates = self._between('left', left - self.max_width - self.WIDTH_SLACK, right)
+        return [word for word in candidates if word.right >= left and word.bottom <= top and word.top >= bottom]
+
+
+def _changes(method):
+    def wrapper(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class WordList(list):
+    """A page's words, as a list whose version goes up on every change made to it."""
+
+    # a class default, since unpickling appends the words before restoring the attributes
+    version = 0
+
+    append = _changes(list.append)
+    extend = _changes(list.extend)
+    insert = _changes(list.insert)
+    pop = _changes(list.pop)
+    remove = _changes(list.remove)
+    clear = _changes(list.clear)
+    sort = _changes(list.sort)
+    reverse = _changes(list.reverse)
+    __setitem__ = _changes(list.__setitem__)
+    __delitem__ = _changes(list.__delitem__)
+    __iadd__ = _changes(list.__iadd__)
+    __imul__ = _changes(list.__imul__)
+
+
+class LayoutTemplate(object):
+    """The column margins of the last page laid out, offered to the next page.
+
+    Pages of a volume nearly all share one geometry, so a page where the previous page's
+    margins still hold takes them and skips the sweep (see Page.reuse_column_margins).
+    Counts how often the previous margins were reused (hits) and how often a page had to
+    be swept (misses).
+    """
+
+    def __init__(self):
+        self.margins = None
+        self.hits = 0
+        self.misses = 0
+
+    def apply(self, page):
+        """Set page's column margins, without a sweep if the template fits; True if it did."""
+        if self.margins is not None and page.reuse_column_margins(self.margins):
+            self.margins = (page.left_edge, page.left_gap_edge, page.right_gap_edge,
+                            page.right_edge)
+            self.hits += 1
+            return True
+        self.margins = page.compute_column_margins()
+        self.misses += 1
+        return False
+
+
 class Page(object):
 
+    MIN_WORDS = 10
     MIN_MARGIN = 10.0
     HEADER_CAP_THRESHOLD = 0.9
     HEADER_1_THRESHOLD_SIZE = 7.5
@@ -109,21 +269,70 @@ class Page(object):
     GAP_RANGE_FRACTION = 0.2
 
     def __init__(self, page_no, left, right, bottom, top):
+        self._languages = None
+        self._word_index = None
+        self._indexed_version = None
         self.words = []
         self.page_no = page_no
         self.left = left
         self.right = right
         self.bottom = bottom
         self.top = top
-        self.sweep_lines = {x: 0 for x in self._increment_by_point_one(self.left, self.right)}
+        self._sweep_origin = int(round(self.left, 1) * 10)
+        self._sweep_size = int(round(self.right, 1) * 10 + 1) - self._sweep_origin
+        self._sweep_deltas = None
+        self._sweep_mask = None
         self.left_edge, self.right_edge = None, None
         self.left_gap_edge, self.right_gap_edge = None, None
+        self.stats = None
+
+    @property
+    def words(self):
+        return self._words
+
+    @words.setter
+    def words(self, words):
+        self._words = WordList(words)
+        self._words_changed()
 
     def add_words(self, words):
         self.words.extend(words)
+        self._words_changed()
 
     def add_word(self, word):
         self.words.append(word)
+        self._words_changed()
+
+    def _words_changed(self):
+        self._languages = None
+        self._word_index = None
+
+    def _check_words(self):
+        # words is a public list that can be changed in place without _words_changed being
+        # called, so the memos are only kept while its version is the one they were made from
+        if self._indexed_version != self._words.version:
+            self._words_changed()
+
+    @property
+    def word_index(self):
+        self._check_words()
+        if self._word_index is None:
+            self._indexed_version = self._words.version
+            self._word_index = WordIndex(self._words)
+        return self._word_index
+
+    def words_in_region(self, left=None, right=None, bottom=None, top=None, overlapping=False):
+        """Return the words inside a region, in page order; None leaves a side of it open.
+
+        With overlapping, words that only partly overlap the region are included too.
+        """
+        left = float('-inf') if left is None else left
+        bottom = float('-inf') if bottom is None else bottom
+        right = float('inf') if right is None else right
+        top = float('inf') if top is None else top
+        if overlapping:
+            return self.word_index.overlapping(left, right, bottom, top)
+        return self.word_index.inside(left, right, bottom, top)
 
     @property
     def text_bottom(self):
@@ -141,8 +350,17 @@ class Page(object):
     def text_right(self):
         return max([w.right for w in self.words])
 
-    def _increment_by_point_one(self, left, right):
-        return [x / 10.0 for x in range(int(round(left, 1) * 10), int(round(right, 1) * 10 + 1))]
+    def _point_one_range(self, left, right):
+        # offsets into the page's 0.1 pt sweep grid of the points from left to right inclusive
+        start = int(round(left, 1) * 10) - self._sweep_origin
+        stop = int(round(right, 1) * 10 + 1) - self._sweep_origin
+        return max(start, 0), min(stop, self._sweep_size)
+
+    def _sweep_point(self, offset):
+        return (offset + self._sweep_origin) / 10.0
+
+    def _sweep_offset(self, pt):
+        return int(round(pt * 10)) - self._sweep_origin
 
     def _vertical_range_adjustment(self):
         distinct_lines = sorted(set([word.bottom for word in self.words]))
@@ -151,46 +369,55 @@ class Page(object):
 
     def _compute_vertical_lines(self):
         bottom, top = self._vertical_range_adjustment()
+        if self._sweep_deltas is None:
+            self._sweep_deltas = [0] * (self._sweep_size + 1)
 
-        middle_words = [w for w in self.words if w.bottom >= bottom and w.bottom <= top]
+        # difference array: +1 where a middle word's span starts, -1 just past where it ends
+        middle_words = self.word_index.with_bottom(bottom, top)
         for word in middle_words:
-            for entry in self._increment_by_point_one(word.left, word.right):
-                self.sweep_lines[entry] += 1
+            start, stop = self._point_one_range(word.left, word.right)
+            self._sweep_deltas[start] += 1
+            self._sweep_deltas[stop] -= 1
 
-    def _middle_gap(self):
+        coverage = itertools.accumulate(self._sweep_deltas[:self._sweep_size])
+        # one byte per grid point, 0 where no middle word covers it, so gaps are found with find()
+        self._sweep_mask = bytes(map(bool, coverage))
+
+    def _middle_gap_window(self):
         left = self.text_left
         right = self.text_right
         midpoint = (right - left) / 2 + left
         sweep_range = (right - left) * self.GAP_RANGE_FRACTION / 2
-        sweep_left, sweep_right = midpoint - sweep_range, midpoint + sweep_range
-
-        left_edge, right_edge = None, None
-        for pt in self._increment_by_point_one(sweep_left, sweep_right):
-            if self.sweep_lines[pt] == 0:
-                if left_edge is None:
-                    left_edge = pt
-                right_edge = pt
-            elif self.sweep_lines[pt] != 0 and left_edge is not None:
-                break
+        return self._point_one_range(midpoint - sweep_range, midpoint + sweep_range)
 
-        assert left_edge is not None and right_edge is not None, "Couldn't find middle gap on page {}".format(self.page_no)
-        return left_edge, right_edge
+    def _middle_gap(self):
+        start, stop = self._middle_gap_window()
+        gap_start = self._sweep_mask.find(b'\x00', start, stop)
+        assert gap_start != -1, "Couldn't find middle gap on page {}".format(self.page_no)
+        gap_stop = self._sweep_mask.find(b'\x01', gap_start, stop)
+        if gap_stop == -1:
+            gap_stop = stop
+        return self._sweep_point(gap_start), self._sweep_point(gap_stop - 1)
 
     def _left_margin(self, gap_edge):
-        margin = self.left
-        for pt in self._increment_by_point_one(self.left, gap_edge):
-            if self.sweep_lines[pt] == 0 and pt != gap_edge:
-                margin = pt
-        return margin
+        start, stop = self._point_one_range(self.left, gap_edge)
+        gap_offset = self._sweep_offset(gap_edge)
+
+        offset = self._sweep_mask.rfind(b'\x00', start, stop)
+        if offset == gap_offset:
+            offset = self._sweep_mask.rfind(b'\x00', start, gap_offset)
+        return self.left if offset == -1 else self._sweep_point(offset)
 
     def _right_margin(self, gap_edge):
-        margin = gap_edge
-        for pt in self._increment_by_point_one(gap_edge, self.right):
-            if self.sweep_lines[pt] == 0 and pt != gap_edge:
-                margin = pt
-                break
-        return margin
+        start, stop = self._point_one_range(gap_edge, self.right)
+        gap_offset = self._sweep_offset(gap_edge)
 
+        offset = self._sweep_mask.find(b'\x00', start, stop)
+        if offset == gap_offset:
+            offset = self._sweep_mask.find(b'\x00', gap_offset + 1, stop)
+        return gap_edge if offset == -1 else self._sweep_point(offset)
+
+    @timed('compute_column_margins')
     def compute_column_margins(self):
         self._compute_vertical_lines()
         self.left_gap_edge, self.right_gap_edge = self._middle_gap()
@@ -198,30 +425,82 @@ class Page(object):
         self.right_edge = self._right_margin(self.right_gap_edge)
         return self.left_edge, self.left_gap_edge, self.right_gap_edge, self.right_edge
 
-    def remove_troublesome_lines(self):
-        troublesome_words = []
+    @timed('compute_column_margins')
+    def reuse_column_margins(self, margins):
+        """Take another page's column margins if they still hold here, without a sweep.
+
+        They hold, giving exactly the margins the sweep would, if no middle word reaches into
+        the gap or onto either outer margin, middle words cover every grid point between each
+        margin and the gap, and the gap is still inside the window the sweep searches.
+        Returns False, leaving the margins unset, otherwise.
+        """
         bottom, top = self._vertical_range_adjustment()
+        left_edge, gap_start, gap_stop, right_edge = [self._sweep_offset(pt) for pt in margins]
+        window_start, window_stop = self._middle_gap_window()
+        if not (self._point_one_range(self.left, self.right)[0] <= left_edge < gap_start and
+                window_start < gap_start <= gap_stop < window_stop - 1 and
+                gap_stop + 1 < right_edge < self._sweep_size):
+            return False
 
-        for w in self.words:
-            if w.left <= self.right_gap_edge and w.right >= self.left_gap_edge:
-                troublesome_words.append(w)
+        clear = [(gap_start, gap_stop), (left_edge, left_edge), (right_edge, right_edge)]
+        if any(self._covered(start, stop, bottom, top) for start, stop in clear):
+            return False
+        # the sweep takes the first gap in the window and the nearest uncovered points to it
+        columns = [(min(left_edge + 1, window_start), gap_start - 1),
+                   (gap_stop + 1, right_edge - 1)]
+        if not all(self._covered_throughout(start, stop, bottom, top) for start, stop in columns):
+            return False
 
-        if len(troublesome_words) > 0:
-            highest_words = [w.bottom for w in troublesome_words if w.bottom >= top]
-            lowest_words = [w.top for w in troublesome_words if w.bottom <= bottom]
+        self.left_edge, self.left_gap_edge, self.right_gap_edge, self.right_edge = [
+            self._sweep_point(offset) for offset in (left_edge, gap_start, gap_stop, right_edge)]
+        return True
+
+    def _middle_spans(self, start, stop, bottom, top):
+        # sweep grid spans of the middle words that cover any point from start to stop
+        # inclusive; rounding to the grid can stretch a word by up to 0.05 pt on either side
+        left, right = self._sweep_point(start) - 0.1, self._sweep_point(stop) + 0.1
+        for word in self.word_index.overlapping(left, right, bottom, top):
+            word_start, word_stop = self._point_one_range(word.left, word.right)
+            if bottom <= word.bottom <= top and word_start <= stop and word_stop > start:
+                yield word_start, word_stop
+
+    def _covered(self, start, stop, bottom, top):
+        return next(self._middle_spans(start, stop, bottom, top), None) is not None
+
+    def _covered_throughout(self, start, stop, bottom, top):
+        reached = start
+        for span_start, span_stop in sorted(self._middle_spans(start, stop, bottom, top)):
+            if span_start > reached:
+                return False
+            reached = max(reached, span_stop)
+        return reached > stop
+
+    @timed('remove_troublesome_lines')
+    def remove_troublesome_lines(self):
+        bottom, top = self._vertical_range_adjustment()
+        troublesome_words = self.words_in_region(self.left_gap_edge, self.right_gap_edge, overlapping=True)
+
+        highest_words = [w.bottom for w in troublesome_words if w.bottom >= top]
+        lowest_words = [w.top for w in troublesome_words if w.bottom <= bottom]
+        if len(highest_words) == 0 and len(lowest_words) == 0:
+            return
+
+        top_threshold = min(highest_words) if len(highest_words) > 0 else float('inf')
+        bottom_threshold = max(lowest_words) if len(lowest_words) > 0 else float('-inf')
+        num_words = len(self.words)
+        self.words[:] = [word for word in self.words
+                         if word.top <= top_threshold and word.bottom >= bottom_threshold]
+        self._words_changed()
+        if self.stats is not None:
+            self.stats.count('troublesome_words_removed', num_words - len(self.words))
 
-            words_to_remove = []
-            for word in self.words:
-                if len(highest_words) > 0 and word.top > min(highest_words):
-                    words_to_remove.append(word)
-                if len(lowest_words) > 0 and word.bottom < max(lowest_words):
-                    words_to_remove.append(word)
+    def _extract_language(self, left, right):
+        return self._assemble_lines(self._column_words(left, right))
 
-            for word in words_to_remove:
-                self.words.remove(word)
+    def _column_words(self, left, right):
+        return self.word_index.inside(left, right, float('-inf'), float('inf'), strict=True)
 
-    def _extract_language(self, left, right):
-        language_words = [word for word in self.words if word.left > left and word.right < right]
+    def _assemble_lines(self, language_words):
         language_words.sort(key=lambda word: (-word.bottom, word.left))
 
         line = Line()
@@ -240,70 +519,126 @@ class Page(object):
 
         return lines
 
+    def _extract_languages(self):
+        margins = (self.left_edge, self.left_gap_edge, self.right_gap_edge, self.right_edge)
+        self._check_words()
+        if self._languages is not None and self._languages[0] == margins:
+            return self._languages[1], self._languages[2]
+        return self._split_languages(margins)
+
+    @timed('extract_language')
+    def _split_languages(self, margins):
+        english_words = self._column_words(self.left_edge, self.left_gap_edge)
+        french_words = self._column_words(self.right_gap_edge, self.right_edge)
+
+        # cached until the words change or any margin is moved
+        self._languages = (margins, self._assemble_lines(english_words), self._assemble_lines(french_words))
+        if self.stats is not None:
+            self.stats.count('lines', len(self._languages[1]) + len(self._languages[2]))
+        return self._languages[1], self._languages[2]
+
     @property
     def english(self):
-        return self._extract_language(self.left_edge, self.left_gap_edge)
+        english, _ = self._extract_languages()
+        return english
 
     @property
     def french(self):
-        return self._extract_language(self.right_gap_edge, self.right_edge)
+        _, french = self._extract_languages()
+        return french
 
     def _check_header(self, line_text):
-        header_match = re.search(r'^(\d+\.)(.*)', line_text)
+        header_match = HEADER_PATTERN.search(line_text)
         if header_match:
             line_text = os.linesep + '**{}**{}'.format(*header_match.group(1, 2))
         return line_text
 
     def _check_letter_paragraph(self, line_text):
-        letter_match = re.search(r'^^\(([a-z]+)\)( .*)', line_text)
+        letter_match = LETTER_PARAGRAPH_PATTERN.search(line_text)
         if letter_match:
             line_text = '  * (_{}_){}'.format(*letter_match.group(1, 2))
         return line_text
 
-    def _convert_line_to_markdown(self, line):
-        prefix = ''
+    def _render_line(self, line):
         markdown_text = line.text
         markdown_text = markdown_text.replace('_', ' ')
         markdown_text = markdown_text.replace('&quot;', '"')
 
         if all([word.fraction_capitalized >= self.HEADER_CAP_THRESHOLD for word in line.words]):
             if line.mean_size >= self.HEADER_1_THRESHOLD_SIZE:
-                prefix = '# '
+                return LINE_HEADER_1, os.linesep + '# ' + markdown_text
             elif line.mean_size >= self.HEADER_2_THRESHOLD_SIZE:
-                prefix = '## '
-
-        if prefix == '':
-            markdown_text = self._check_header(markdown_text)
-            markdown_text = self._check_letter_paragraph(markdown_text)
-        else:
-            prefix = os.linesep + prefix
+                return LINE_HEADER_2, os.linesep + '## ' + markdown_text
+
+        # both checks always change the text when they match, and can't both match
+        header_text = self._check_header(markdown_text)
+        if header_text != markdown_text:
+            return LINE_SECTION, header_text
+        paragraph_text = self._check_letter_paragraph(markdown_text)
+        if paragraph_text != markdown_text:
+            return LINE_PARAGRAPH, paragraph_text
+        return LINE_TEXT, markdown_text
+
+    def classify_line(self, line):
+        """Return which of LINE_KINDS the line is rendered to markdown as."""
+        kind, _ = self._render_line(line)
+        return kind
+
+    @timed('markdown')
+    def _convert_line_to_markdown(self, line):
+        _, markdown_text = self._render_line(line)
+        return markdown_text
 
-        return prefix + markdown_text
+    def iter_markdown(self, lines):
+        for line in lines:
+            yield self._convert_line_to_markdown(line) + os.linesep
 
     def convert_to_markdown(self, lines):
-        markdown_buffer = io.StringIO()
-        for line in lines:
-            markdown_line = self._convert_line_to_markdown(line)
-            markdown_buffer.write(markdown_line + os.linesep)
-        output = markdown_buffer.getvalue()
-        markdown_buffer.close()
-        return output
+        return ''.join(self.iter_markdown(lines))
 
 
 class Line(object):
 
     MIN_VERTICAL_OVERLAP_FRACTION = 0.5
 
+    __slots__ = ('words', '_left', '_right', '_bottom', '_top', '_weighted_size', '_num_chars',
+                 '_fonts', '_mode_font')
+
     def __init__(self):
         self.words = []
+        self._left, self._right = None, None
+        self._bottom, self._top = None, None
+        self._weighted_size = 0.0
+        self._num_chars = 0
+        self._fonts = {}
+        self._mode_font = None
 
     def add_word(self, word):
         if self.can_add(word):
             self.words.append(word)
+            self._update_aggregates(word)
             return True
         else:
             return False
 
+    def _update_aggregates(self, word):
+        if len(self.words) == 1:
+            self._left, self._right = word.left, word.right
+            self._bottom, self._top = word.bottom, word.top
+        else:
+            self._left = min(self._left, word.left)
+            self._right = max(self._right, word.right)
+            self._bottom = min(self._bottom, word.bottom)
+            self._top = max(self._top, word.top)
+
+        self._weighted_size += word.num_chars * word.mean_size
+        self._num_chars += word.num_chars
+
+        count = self._fonts.get(word.mode_font, 0) + word.num_chars
+        self._fonts[word.mode_font] = count
+        if self._mode_font is None or (-count, word.mode_font) < (-self._fonts[self._mode_font], self._mode_font):
+            self._mode_font = word.mode_font
+
     def vertical_overlap(self, word):
         intersection_length = min(self.top, word.top) - max(self.bottom, word.bottom)
         return max(intersection_length / self.height, intersection_length / word.height)
@@ -314,19 +649,19 @@ class Line(object):
 
     @property
     def left(self):
-        return min([word.left for word in self.words])
+        return self._left
 
     @property
     def right(self):
-        return max([word.right for word in self.words])
+        return self._right
 
     @property
     def bottom(self):
-        return min([word.bottom for word in self.words])
+        return self._bottom
 
     @property
     def top(self):
-        return max([word.top for word in self.words])
+        return self._top
 
     @property
     def height(self):
@@ -334,18 +669,11 @@ class Line(object):
 
     @property
     def mean_size(self):
-        weighted_size = sum([word.num_chars * word.mean_size for word in self.words])
-        total_size = sum([word.num_chars for word in self.words])
-        return weighted_size / total_size
+        return self._weighted_size / self._num_chars
 
     @property
     def mode_font(self):
-        fonts = {}
-        for word in self.words:
-            fonts[word.mode_font] = fonts.get(word.mode_font, 0) + word.num_chars
-
-        font, _ = sorted(fonts.items(), key=lambda f: (-f[1], f[0]))[0]
-        return font
+        return self._mode_font
 
     @property
     def text(self):
@@ -353,6 +681,10 @@ class Line(object):
 
     def sort_words(self):
         self.words.sort(key=lambda word: word.left)
+        # re-sum in the new word order so mean_size matches a fresh left-to-right sum exactly
+        self._weighted_size = 0.0
+        for word in self.words:
+            self._weighted_size += word.num_chars * word.mean_size
 
     def __repr__(self):
         data = ' '.join([word.text for word in self.words])
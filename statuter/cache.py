@@ -0,0 +1,176 @@
+import hashlib
+import io
+import json
+import math
+import os
+import struct
+import zlib
+from statuter import sources
+from statuter.block import Page, Word
+
+
+FORMAT_VERSION = 1
+ENTRY_SUFFIX = '.page'
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+BBOX_STRUCT = struct.Struct('<4d')
+WORD_STRUCT = struct.Struct('<5d3I')
+COUNT_STRUCT = struct.Struct('<I')
+FONT_COUNT_STRUCT = struct.Struct('<2I')
+
+
+def layout_parameters():
+    """The class constants that change the result of laying out a page."""
+    return [Page.MIN_WORDS, Page.MIN_MARGIN, Page.GAP_RANGE_FRACTION, Word.MAX_HORIZONTAL_OVERLAP,
+            Word.MAX_HORIZONTAL_SPACING, Word.MIN_VERTICAL_OVERLAP_FRACTION]
+
+
+def input_hash(path):
+    digest = hashlib.sha256()
+    for chunk in sources.iter_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _float(value):
+    return float('nan') if value is None else value
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+def _write_string(buffer, value):
+    data = value.encode('utf-8')
+    buffer.write(COUNT_STRUCT.pack(len(data)))
+    buffer.write(data)
+
+
+def _read_string(buffer):
+    length, = COUNT_STRUCT.unpack(buffer.read(COUNT_STRUCT.size))
+    return buffer.read(length).decode('utf-8')
+
+
+def _read_count(buffer):
+    count, = COUNT_STRUCT.unpack(buffer.read(COUNT_STRUCT.size))
+    return count
+
+
+def pack_page(page):
+    """Serialize a laid-out page's words and margins to compressed bytes."""
+    states = [word.state() for word in page.words]
+    fonts = sorted(set(font for state in states for font in state[8]))
+    font_ids = {font: i for i, font in enumerate(fonts)}
+
+    buffer = io.BytesIO()
+    _write_string(buffer, str(page.page_no))
+    buffer.write(BBOX_STRUCT.pack(page.left, page.right, page.bottom, page.top))
+    buffer.write(BBOX_STRUCT.pack(*[_float(edge) for edge in (page.left_edge, page.left_gap_edge,
+                                                               page.right_gap_edge, page.right_edge)]))
+
+    buffer.write(COUNT_STRUCT.pack(len(fonts)))
+    for font in fonts:
+        _write_string(buffer, font)
+
+    buffer.write(COUNT_STRUCT.pack(len(states)))
+    for texts, left, right, bottom, top, total_size, caps, non_caps, font_counts, mode_font in states:
+        buffer.write(WORD_STRUCT.pack(_float(left), _float(right), _float(bottom), _float(top), total_size,
+                                      caps, non_caps, font_ids.get(mode_font, len(fonts))))
+        # character texts are XML character data, so they can never contain NUL
+        _write_string(buffer, '\0'.join(texts))
+        buffer.write(COUNT_STRUCT.pack(len(texts)))
+        buffer.write(COUNT_STRUCT.pack(len(font_counts)))
+        for font, count in sorted(font_counts.items()):
+            buffer.write(FONT_COUNT_STRUCT.pack(font_ids[font], count))
+
+    return zlib.compress(buffer.getvalue())
+
+
+def unpack_page(data):
+    buffer = io.BytesIO(zlib.decompress(data))
+    page_no = _read_string(buffer)
+    left, right, bottom, top = BBOX_STRUCT.unpack(buffer.read(BBOX_STRUCT.size))
+    page = Page(page_no, left, right, bottom, top)
+    margins = BBOX_STRUCT.unpack(buffer.read(BBOX_STRUCT.size))
+    page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge = [_optional(m) for m in margins]
+
+    fonts = [_read_string(buffer) for _ in range(_read_count(buffer))]
+
+    words = []
+    for _ in range(_read_count(buffer)):
+        left, right, bottom, top, total_size, caps, non_caps, mode_font = \
+            WORD_STRUCT.unpack(buffer.read(WORD_STRUCT.size))
+        joined_texts = _read_string(buffer)
+        num_chars = _read_count(buffer)
+        texts = joined_texts.split('\0') if num_chars > 0 else []
+
+        font_counts = {}
+        for _ in range(_read_count(buffer)):
+            font_id, count = FONT_COUNT_STRUCT.unpack(buffer.read(FONT_COUNT_STRUCT.size))
+            font_counts[fonts[font_id]] = count
+
+        words.append(Word.from_state((texts, _optional(left), _optional(right), _optional(bottom),
+                                      _optional(top), total_size, caps, non_caps, font_counts,
+                                      fonts[mode_font] if mode_font < len(fonts) else None)))
+    page.words = words
+    return page
+
+
+class PageCache(object):
+    """A size-bounded on-disk cache of laid-out pages.
+
+    Entries are keyed on the input file's content hash, the page id and the layout
+    parameters, so changing any of them misses. Reading an entry refreshes its mtime, and
+    evict() removes the least recently used entries until the cache fits in max_bytes.
+    Entries are written as single files, so worker processes can share a cache directory.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def _entry_path(self, source_hash, page_no):
+        key = json.dumps([FORMAT_VERSION, source_hash, str(page_no), layout_parameters()])
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + ENTRY_SUFFIX)
+
+    def contains(self, source_hash, page_no):
+        return os.path.exists(self._entry_path(source_hash, page_no))
+
+    def get(self, source_hash, page_no):
+        path = self._entry_path(source_hash, page_no)
+        try:
+            with open(path, 'rb') as entry_file:
+                data = entry_file.read()
+            os.utime(path, None)
+        except OSError:
+            return None
+        return unpack_page(data)
+
+    def put(self, source_hash, page):
+        path = self._entry_path(source_hash, page.page_no)
+        temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary_path, 'wb') as entry_file:
+            entry_file.write(pack_page(page))
+        os.replace(temporary_path, path)
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,211 @@
+import ast
+import array
+import os
+import struct
+import sys
+import zipfile
+from statuter import sources
+from statuter.block import LINE_KINDS
+from statuter.index import PageIndex
+from statuter.loader import iter_pages
+
+
+NPY_MAGIC = b'\x93NUMPY'
+# .npy headers are padded so that the data starts on this boundary
+NPY_ALIGNMENT = 64
+LANGUAGES = ('eng', 'fra')
+
+# .npy dtype of each column kind, and the array typecode its values are packed with
+DTYPES = {
+    'float64': ('<f8', 'd'),
+    'int64': ('<i8', 'q'),
+    'int32': ('<i4', 'i'),
+    'int8': ('|i1', 'b'),
+    'uint8': ('|u1', 'B'),
+}
+TYPECODES = {descr: typecode for descr, typecode in DTYPES.values()}
+
+
+def _npy_header(descr, length):
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(descr, length)
+    # magic, version 1.0, 2-byte header length, header, padding and a closing newline
+    padding = -(len(NPY_MAGIC) + 4 + len(header) + 1) % NPY_ALIGNMENT
+    header += ' ' * padding + '\n'
+    return NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def npy_bytes(values, kind):
+    """Serialize a sequence of numbers as a one-dimensional .npy array of the given kind."""
+    descr, typecode = DTYPES[kind]
+    data = array.array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return _npy_header(descr, len(data)) + data.tobytes()
+
+
+def npy_strings(values):
+    """Serialize strings as a .npy array of fixed width unicode, as numpy stores str arrays."""
+    width = max([len(value) for value in values] or [1])
+    data = b''.join(value.ljust(width, '\0').encode('utf-32-le') for value in values)
+    return _npy_header('<U{}'.format(width), len(values)) + data
+
+
+def read_npy(data):
+    """Return the values of a one-dimensional .npy array written by this module.
+
+    Numbers come back as a list and unicode arrays as a list of str. Any numpy can read
+    these files too; this is for consumers and tests that do without it.
+    """
+    if not data.startswith(NPY_MAGIC):
+        raise ValueError('Not a .npy array')
+    header_length, = struct.unpack('<H', data[8:10])
+    header = ast.literal_eval(data[10:10 + header_length].decode('latin1'))
+    body = data[10 + header_length:]
+    descr, (length,) = header['descr'], header['shape']
+
+    if descr.startswith('<U'):
+        width = int(descr[2:])
+        text = body.decode('utf-32-le')
+        return [text[i * width:(i + 1) * width].rstrip('\0') for i in range(length)]
+
+    values = array.array(TYPECODES[descr])
+    values.frombytes(body[:length * values.itemsize])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+class _TextColumn(object):
+    """Strings stored Arrow-style: UTF-8 bytes back to back, and the offset where each starts."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = [0]
+
+    def append(self, text):
+        self.data += text.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+
+class ColumnarExport(object):
+    """Collects the lines and words of laid-out pages into columns.
+
+    Every line gets a row in the line_* columns and every word one in the word_*
+    columns. Rows are keyed by page, language (an index into languages: English, then
+    French) and line index, the line's position in its page's column. Text is stored as
+    UTF-8 bytes with offsets, fonts and line kinds as indexes into the fonts and
+    line_kinds string columns.
+    """
+
+    LINE_COLUMNS = ('page', 'language', 'line', 'left', 'right', 'bottom', 'top', 'mean_size',
+                    'mode_font', 'kind')
+    WORD_COLUMNS = ('page', 'language', 'line', 'word', 'left', 'right', 'bottom', 'top',
+                    'mean_size', 'mode_font', 'fraction_capitalized')
+    KINDS = {
+        'page': 'int64', 'language': 'int8', 'line': 'int32', 'word': 'int32', 'left': 'float64',
+        'right': 'float64', 'bottom': 'float64', 'top': 'float64', 'mean_size': 'float64',
+        'mode_font': 'int32', 'kind': 'int8', 'fraction_capitalized': 'float64',
+    }
+
+    def __init__(self):
+        self.lines = {column: [] for column in self.LINE_COLUMNS}
+        self.words = {column: [] for column in self.WORD_COLUMNS}
+        self.line_text = _TextColumn()
+        self.word_text = _TextColumn()
+        self.fonts = []
+        self._font_ids = {}
+
+    def _font_id(self, font):
+        font = '' if font is None else font
+        if font not in self._font_ids:
+            self._font_ids[font] = len(self.fonts)
+            self.fonts.append(font)
+        return self._font_ids[font]
+
+    def add_page(self, page):
+        page_no = int(page.page_no)
+        for language, lines in enumerate((page.english, page.french)):
+            for line_no, line in enumerate(lines):
+                self._add_line(page, page_no, language, line_no, line)
+
+    def _add_line(self, page, page_no, language, line_no, line):
+        kind = LINE_KINDS.index(page.classify_line(line))
+        row = (page_no, language, line_no, line.left, line.right, line.bottom, line.top,
+               line.mean_size, self._font_id(line.mode_font), kind)
+        for column, value in zip(self.LINE_COLUMNS, row):
+            self.lines[column].append(value)
+        self.line_text.append(line.text)
+
+        for word_no, word in enumerate(line.words):
+            row = (page_no, language, line_no, word_no, word.left, word.right, word.bottom,
+                   word.top, word.mean_size, self._font_id(word.mode_font),
+                   word.fraction_capitalized)
+            for column, value in zip(self.WORD_COLUMNS, row):
+                self.words[column].append(value)
+            self.word_text.append(word.text)
+
+    def arrays(self):
+        """Return {array name: .npy bytes} for every column."""
+        arrays = {}
+        tables = (('line', self.lines, self.LINE_COLUMNS, self.line_text),
+                  ('word', self.words, self.WORD_COLUMNS, self.word_text))
+        for prefix, table, columns, text in tables:
+            for column in columns:
+                arrays['{}_{}'.format(prefix, column)] = npy_bytes(table[column], self.KINDS[column])
+            arrays[prefix + '_text_data'] = npy_bytes(text.data, 'uint8')
+            arrays[prefix + '_text_offsets'] = npy_bytes(text.offsets, 'int64')
+
+        arrays['fonts'] = npy_strings(self.fonts)
+        arrays['line_kinds'] = npy_strings(LINE_KINDS)
+        arrays['languages'] = npy_strings(LANGUAGES)
+        return arrays
+
+    def write(self, path):
+        """Write the columns to an .npz archive, or to a directory of .npy files.
+
+        Archive members are stored uncompressed, so they can be read in place. numpy can
+        memory-map the .npy files of a directory with np.load(path, mmap_mode='r').
+        """
+        arrays = self.arrays()
+        if path.endswith('.npz'):
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+                for name in sorted(arrays):
+                    archive.writestr(name + '.npy', arrays[name])
+            return
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for name, data in arrays.items():
+            with open(os.path.join(path, name + '.npy'), 'wb') as npy_file:
+                npy_file.write(data)
+
+
+def export_columns(source, output_path, pages=None, backend='sax', cache=None):
+    """Write the columns of the given pages of a volume, or all of its pages, to output_path.
+
+    All pages can only be found for an uncompressed file, through its page index.
+    """
+    if pages is None:
+        if not sources.is_plain_file(source):
+            raise ValueError('Pages must be given for compressed or streamed input')
+        pages = [page_id for page_id, _, _ in PageIndex.for_file(source).pages]
+
+    export = ColumnarExport()
+    for page in iter_pages(source, pages, backend=backend, cache=cache):
+        export.add_page(page)
+    export.write(output_path)
+    return export
+
+
+def load_columns(path):
+    """Read the arrays of an .npz archive or .npy directory back as {name: values}."""
+    if path.endswith('.npz'):
+        with zipfile.ZipFile(path) as archive:
+            return {name[:-len('.npy')]: read_npy(archive.read(name)) for name in archive.namelist()}
+
+    columns = {}
+    for name in os.listdir(path):
+        if name.endswith('.npy'):
+            with open(os.path.join(path, name), 'rb') as npy_file:
+                columns[name[:-len('.npy')]] = read_npy(npy_file.read())
+    return columns
@@ -0,0 +1,167 @@
+import collections
+import hashlib
+import json
+import mmap
+import os
+import re
+import warnings
+
+
+PAGE_PATTERN = re.compile(rb'<page\s[^>]*?\bid="([^"]*)"')
+PAGE_BBOX_PATTERN = re.compile(rb'<page\s[^>]*?\bbbox="([^"]*)"')
+TEXT_BBOX_PATTERN = re.compile(rb'<text\s[^>]*?\bbbox="([^"]*)"')
+INDEX_SUFFIX = '.pageindex'
+INDEX_VERSION = 2
+# where an index is kept when it can't be written next to its input
+INDEX_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                               os.path.join(os.path.expanduser('~'), '.cache'),
+                               'statuter', 'pageindex')
+READ_BUFFER_SIZE = 2 ** 16
+
+# bbox is the page's (left, bottom, right, top) and text_extents that of its characters, or
+# None if it has none
+PageStatistics = collections.namedtuple('PageStatistics', ['characters', 'bbox', 'text_extents'])
+
+
+def page_statistics(data, start, end):
+    """Catalog the page whose XML is data[start:end] without parsing it."""
+    match = PAGE_BBOX_PATTERN.match(data, start, end)
+    bbox = tuple(map(float, match.group(1).split(b','))) if match else None
+    boxes = TEXT_BBOX_PATTERN.findall(data, start, end)
+    if not boxes:
+        return PageStatistics(0, bbox, None)
+
+    # every fourth coordinate of the joined (left, bottom, right, top) boxes is a left edge
+    coordinates = b','.join(boxes).split(b',')
+    text_extents = (min(map(float, coordinates[0::4])), min(map(float, coordinates[1::4])),
+                    max(map(float, coordinates[2::4])), max(map(float, coordinates[3::4])))
+    return PageStatistics(len(boxes), bbox, text_extents)
+
+
+def _index_paths(path):
+    # the sidecar next to path, then a file in INDEX_CACHE_DIR named by path's hash
+    key = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return [path + INDEX_SUFFIX, os.path.join(INDEX_CACHE_DIR, key + INDEX_SUFFIX)]
+
+
+class PageIndex(object):
+    """Byte offsets of every <page> element in an RSC XML file, and a PageStatistics of each.
+
+    The index is stored in a sidecar file next to the input, or in INDEX_CACHE_DIR if the
+    input's directory can't be written, and is rebuilt whenever the input's size or
+    modification time no longer match the ones it was built from.
+    """
+
+    def __init__(self, path, size, mtime, header_end, pages, stats=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.header_end = header_end
+        self.pages = pages
+        self.stats = stats or {}
+        self._offsets = {page_id: (start, end) for page_id, start, end in pages}
+
+    @classmethod
+    def build(cls, path):
+        stat = os.stat(path)
+        starts = []
+        pages = []
+        stats = {}
+        if stat.st_size > 0:
+            with open(path, 'rb') as xml_file:
+                with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    for match in PAGE_PATTERN.finditer(data):
+                        starts.append((match.group(1).decode('utf-8'), match.start()))
+
+                    for i, (page_id, start) in enumerate(starts):
+                        end = starts[i + 1][1] if i + 1 < len(starts) else stat.st_size
+                        pages.append((page_id, start, end))
+                        stats[page_id] = page_statistics(data, start, end)
+
+        header_end = starts[0][1] if starts else stat.st_size
+        return cls(path, stat.st_size, stat.st_mtime_ns, header_end, pages, stats)
+
+    @classmethod
+    def load(cls, path):
+        """Return the sidecar index for path, or None if it is missing or stale."""
+        for index_path in _index_paths(path):
+            index = cls._load(path, index_path)
+            if index is not None:
+                return index
+        return None
+
+    @classmethod
+    def _load(cls, path, index_path):
+        try:
+            with open(index_path, 'r') as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(path)
+        if data.get('version') != INDEX_VERSION:
+            return None
+        if data.get('size') != stat.st_size or data.get('mtime') != stat.st_mtime_ns:
+            return None
+
+        pages = [tuple(entry) for entry in data['pages']]
+        stats = {page_id: PageStatistics(characters, tuple(bbox) if bbox else None,
+                                         tuple(text_extents) if text_extents else None)
+                 for page_id, (characters, bbox, text_extents) in data['stats'].items()}
+        return cls(path, data['size'], data['mtime'], data['header_end'], pages, stats)
+
+    @classmethod
+    def for_file(cls, path):
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            index.save()
+        return index
+
+    def save(self):
+        data = {
+            'version': INDEX_VERSION,
+            'size': self.size,
+            'mtime': self.mtime,
+            'header_end': self.header_end,
+            'pages': self.pages,
+            'stats': self.stats,
+        }
+        for index_path in _index_paths(self.path):
+            try:
+                os.makedirs(os.path.dirname(index_path) or os.curdir, exist_ok=True)
+                with open(index_path, 'w') as index_file:
+                    json.dump(data, index_file)
+                return
+            except OSError:
+                pass
+        warnings.warn('Could not save the page index of {}; it will be rebuilt on every '
+                      'run'.format(self.path), RuntimeWarning)
+
+    def __contains__(self, page_id):
+        return str(page_id) in self._offsets
+
+    def offsets(self, page_id):
+        return self._offsets[str(page_id)]
+
+    def read_chunks(self, page_numbers):
+        """Yield the file header followed by the raw bytes of each requested page.
+
+        The header holds everything before the first page (XML declaration and any
+        enclosing element), so the chunks form a well-formed prefix a parser can consume.
+        Pages are read in document order regardless of the order they were requested in.
+        """
+        wanted = set(str(page_number) for page_number in page_numbers)
+        if self.size == 0:
+            return
+
+        with open(self.path, 'rb') as xml_file:
+            with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data[:self.header_end]
+
+                for page_id, start, end in self.pages:
+                    if page_id not in wanted:
+                        continue
+
+                    for offset in range(start, end, READ_BUFFER_SIZE):
+                        yield data[offset:min(offset + READ_BUFFER_SIZE, end)]
@@ -1,90 +1,569 @@
-from xml.sax import make_parser, handler
-from statuter.block import Page, Word, Character
+import collections
+import heapq
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax import handler
+from statuter.backends import make_backend
+from statuter.block import Page, Word, Character, LayoutTemplate
+from statuter.cache import input_hash
+from statuter.index import PageIndex
+from statuter.profiler import PageStats
+from statuter import reference, sources
+
+
+# pages each stage of the extraction pipeline may get ahead of the next
+DEFAULT_QUEUE_SIZE = 16
+# how often a pipeline stage blocked on a full queue checks whether it should stop
+STOP_POLL_SECONDS = 0.1
+_END = object()
 
 
 class RscLoader(handler.ContentHandler):
 
-    def __init__(self, page_number):
+    def __init__(self, page_numbers, profile=False):
         handler.ContentHandler.__init__(self)
-        self._page_number = str(page_number)
+        self._profile = profile
+        # the open page's parse time is counted only while the parser is being fed, so time
+        # spent by the consumer between feeds isn't charged to it
+        self._page_start = None
+        self._parse_seconds = 0.0
+        self._page_numbers = set(str(page_number) for page_number in page_numbers)
+        self._pages_remaining = len(self._page_numbers)
         self.page = None
+        self.pages = collections.deque()
         self._on_current_page = False
         self._current_word = None
         self._current_character = None
 
     def startElement(self, name, attrs):
-        if name == 'page' and attrs.get('id') == self._page_number:
+        if name == 'page' and attrs.get('id') in self._page_numbers:
             self._on_current_page = True
+            self._current_word = None
             left, bottom, right, top = self._extract_bbox(attrs['bbox'])
-            self.page = Page(self._page_number, left, right, bottom, top)
+            self.page = Page(attrs['id'], left, right, bottom, top)
+            if self._profile:
+                self.page.stats = PageStats()
+                self._page_start = time.perf_counter()
+                self._parse_seconds = 0.0
 
         if self._on_current_page is True and name == 'text':
             left, bottom, right, top = self._extract_bbox(attrs['bbox'])
-            self._current_character = Character(left, right, bottom, top, size=float(attrs['size']), font=attrs['font'])
+            self._current_character = Character(left, right, bottom, top, size=float(attrs['size']),
+                                                font=sys.intern(attrs['font']))
 
     def characters(self, content):
         if self._current_character is not None:
-            self._current_character.text = content
+            self._current_character.text += content
 
     def endElement(self, name):
         if name == 'page':
             if self._on_current_page is True:
                 self._on_current_page = False
-                raise DocumentFinishedException()
+                if self._profile:
+                    self.pause_timer()
+                    self._record_parse(self.page)
+                self.pages.append(self.page)
+                self._pages_remaining -= 1
+                if self._pages_remaining == 0:
+                    raise DocumentFinishedException()
 
         if self._on_current_page is True and name == 'text':
-            if self._current_word is None:
-                self._current_word = Word()
-                self.page.add_word(self._current_word)
+            self._add_character(self._current_character)
+            self._current_character = None
+
+    def _add_character(self, character):
+        if self._current_word is None or not self._current_word.add_character(character):
+            self._current_word = Word()
+            self.page.add_word(self._current_word)
+            self._current_word.add_character(character)
 
-            if self._current_word.add_character(self._current_character):
-                self._current_character = None
-            else:
-                self._current_word = Word()
-                self.page.add_word(self._current_word)
-                self._current_word.add_character(self._current_character)
-                self._current_character = None
+    def resume_timer(self):
+        if self._profile and self._on_current_page and self._page_start is None:
+            self._page_start = time.perf_counter()
 
+    def pause_timer(self):
+        if self._page_start is not None:
+            self._parse_seconds += time.perf_counter() - self._page_start
+            self._page_start = None
+
+    def _record_parse(self, page):
+        page.stats.add_time('parse', self._parse_seconds)
+        page.stats.count('characters', sum(word.num_chars for word in page.words))
+        page.stats.count('words', len(page.words))
 
     # returns a tuple of (left, bottom, right, top)
     def _extract_bbox(self, bbox):
-        return [float(x) for x in bbox.split(',')]
+        return tuple(map(float, bbox.split(',')))
 
 
 class DocumentFinishedException(Exception):
     pass
 
 
-def get_page(path, page_number):
-    parser = make_parser()
-    content_loader = RscLoader(page_number)
-    parser.setContentHandler(content_loader)
+def _parse_pages(source, page_numbers, use_index=True, backend='sax', profile=False):
+    page_numbers = list(page_numbers)
+    if use_index and sources.is_plain_file(source):
+        return _parse_indexed_pages(PageIndex.for_file(source), page_numbers, backend, profile)
+    return _parse_chunks(sources.iter_chunks(source), page_numbers, backend, profile)
+
+
+def _blank_page(page_id, page_stats, profile=False):
+    left, bottom, right, top = page_stats.bbox
+    page = Page(page_id, left, right, bottom, top)
+    if profile:
+        page.stats = PageStats()
+        page.stats.count('characters', page_stats.characters)
+        page.stats.count('skipped_pages', 1)
+    return page
+
+
+def _parse_indexed_pages(index, page_numbers, backend='sax', profile=False):
+    """Parse the requested pages through index, in document order.
+
+    A page with fewer characters than Page.MIN_WORDS cannot have enough words to be laid
+    out, so it is not read at all; an empty page is yielded in its place, as layout would
+    leave it.
+    """
+    wanted = set(str(page_number) for page_number in page_numbers)
+    requested = [page_id for page_id, _, _ in index.pages if page_id in wanted]
+    dense = set(page_id for page_id in requested
+                if index.stats[page_id].characters >= Page.MIN_WORDS
+                or index.stats[page_id].bbox is None)
+
+    parsed = _parse_chunks(index.read_chunks(dense), dense, backend, profile)
+    for page_id in requested:
+        if page_id in dense:
+            page = next(parsed, None)
+            if page is None:
+                # duplicate or malformed page ids leave the parser short of the index
+                raise ValueError('Page {} in the index of {} could not be parsed'.format(
+                    page_id, index.path))
+            yield page
+        else:
+            yield _blank_page(page_id, index.stats[page_id], profile)
+    parsed.close()
+
+
+def _parse_chunks(chunks, page_numbers, backend='sax', profile=False):
+    page_numbers = list(page_numbers)
+    if not page_numbers:
+        # with no page to finish on, the parser would read the whole source for nothing
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        return
+
+    content_loader = RscLoader(page_numbers, profile)
+    parser = make_backend(backend, content_loader)
+    for chunk in chunks:
+        content_loader.resume_timer()
+        try:
+            parser.feed(chunk)
+        except DocumentFinishedException:
+            chunks.close()
+        content_loader.pause_timer()
+
+        while content_loader.pages:
+            yield content_loader.pages.popleft()
+
+
+def _layout_page(page, layout_template=None):
+    if len(page.words) < Page.MIN_WORDS:
+        page.words = []
+        if page.stats is not None:
+            page.stats.count('blank_pages', 1)
+
+    if page.words != []:
+        if layout_template is None:
+            page.compute_column_margins()
+        else:
+            reused = layout_template.apply(page)
+            if page.stats is not None:
+                page.stats.count('layout_reused' if reused else 'layout_swept', 1)
+        page.remove_troublesome_lines()
+
+    return page
+
+
+def _source_pages(source, page_numbers, use_index=True, backend='sax', cache=None, profile=False):
+    """Yield (page, laid_out, source_hash) for each requested page in page order.
+
+    Pages found in cache are already laid out; the rest are parsed from source. The cache
+    is only consulted for sources given by path, since it is keyed on the file's hash.
+    """
+    if cache is None or hasattr(source, 'read'):
+        for page in _parse_pages(source, page_numbers, use_index, backend, profile):
+            yield page, False, None
+        return
+
+    source_hash = input_hash(source)
+    cached, missing = [], []
+    for page_number in page_numbers:
+        if cache.contains(source_hash, page_number):
+            cached.append(page_number)
+        else:
+            missing.append(page_number)
+
+    parsed_pages = []
+    if missing:
+        parsed_pages = ((page, False, source_hash)
+                        for page in _parse_pages(source, missing, use_index, backend, profile))
+    # cached pages are only unpacked as the merge reaches them, so a large cached volume
+    # streams like a parsed one
+    cached_pages = (_cached_page(source, page_number, source_hash, cache, use_index, backend,
+                                 profile)
+                    for page_number in sorted(cached, key=int))
+    for entry in heapq.merge(cached_pages, parsed_pages, key=lambda entry: int(entry[0].page_no)):
+        yield entry
+
+
+def _cached_page(source, page_number, source_hash, cache, use_index, backend, profile):
+    page = _from_cache(cache, source_hash, page_number, profile)
+    if page is None:
+        # evicted since it was found, so it is parsed after all
+        parsed = _parse_pages(source, [page_number], use_index, backend, profile)
+        page = next(parsed)
+        parsed.close()
+        return page, False, source_hash
+    return page, True, source_hash
+
+
+def _from_cache(cache, source_hash, page_number, profile=False):
+    page = cache.get(source_hash, page_number)
+    if page is not None and profile:
+        page.stats = PageStats()
+        page.stats.count('cached_pages', 1)
+    return page
+
+
+def _finish_page(page, laid_out=False, source_hash=None, cache=None, layout_template=None):
+    if not laid_out:
+        page = _layout_page(page, layout_template)
+        if cache is not None and source_hash is not None:
+            cache.put(source_hash, page)
+    return page
+
+
+def iter_pages(source, page_numbers, use_index=True, backend='sax', cache=None,
+               layout_template=None):
+    """Yield laid-out pages for every requested page number in a single pass over the file.
+
+    source is a path or a binary file object, and may be compressed (see
+    statuter.sources). Pages are yielded in document order as soon as their closing tag
+    has been read, and parsing stops once the last requested page is finished. With
+    use_index, an uncompressed file's page index is used to read only the bytes of the
+    requested pages. backend names the XML parser that drives RscLoader (see
+    statuter.backends.BACKENDS). With a statuter.cache.PageCache, pages laid out by an
+    earlier run are read from the cache instead of being parsed again. With a
+    statuter.block.LayoutTemplate, each page skips the column sweep when the previous
+    page's column gap is still clear on it.
+    """
+    for page, laid_out, source_hash in _source_pages(source, page_numbers, use_index, backend,
+                                                     cache):
+        yield _finish_page(page, laid_out, source_hash, cache, layout_template)
+
+    if cache is not None:
+        cache.evict()
+
+
+def get_page(source, page_number, use_index=True, backend='sax', cache=None):
+    for page in iter_pages(source, [page_number], use_index, backend, cache):
+        return page
+
+
+def render_chunks(chunks, page_number, backend='sax', cache=None, source_hash=None,
+                  layout_template=None, profile=False):
+    """Parse, lay out and render one page from chunks, XML bytes that hold it, such as the file
+    header and the page's bytes from its statuter.index.PageIndex.
+
+    Returns (page, english_markdown, french_markdown), or None if chunks hold no such page.
+    With a statuter.cache.PageCache and the source's source_hash, a cached page is used
+    without reading chunks, and a parsed one is added to the cache. layout_template is used
+    as in iter_pages, and with profile the page's stage timings and counts are left in
+    page.stats.
+    """
+    page = None
+    if cache is not None and source_hash is not None:
+        page = _from_cache(cache, source_hash, page_number, profile)
+    laid_out = page is not None
+    if laid_out:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    else:
+        parsed = _parse_chunks(chunks, [page_number], backend, profile)
+        page = next(parsed, None)
+        parsed.close()
+        if page is None:
+            return None
+
+    page = _finish_page(page, laid_out, source_hash, cache, layout_template)
+    return page, page.convert_to_markdown(page.english), page.convert_to_markdown(page.french)
+
 
+# each pool worker carries margins between the pages it lays out
+_worker_layout_template = None
+
+
+def _render_page(page, laid_out=False, source_hash=None, cache=None, reuse_layout=False):
+    """Lay out and render a page in a pool worker; also returns whether its margins were reused,
+    or None if it was not laid out with a template.
+    """
+    global _worker_layout_template
+    layout_template = None
+    if reuse_layout and not laid_out:
+        if _worker_layout_template is None:
+            _worker_layout_template = LayoutTemplate()
+        layout_template = _worker_layout_template
+    hits = layout_template.hits if layout_template is not None else None
+
+    page = _finish_page(page, laid_out, source_hash, cache, layout_template)
+    english_markdown = page.convert_to_markdown(page.english)
+    french_markdown = page.convert_to_markdown(page.french)
+    reused = None
+    if layout_template is not None and page.words != []:
+        reused = layout_template.hits > hits
+    return page.page_no, english_markdown, french_markdown, page.stats, reused
+
+
+def _put(items, item, stopped):
+    while not stopped.is_set():
+        try:
+            items.put(item, timeout=STOP_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _threaded(items, queue_size):
+    """Yield items, iterating over them on a separate thread that runs up to queue_size ahead.
+
+    An exception raised by items is raised here instead. Closing the generator stops the
+    thread once it finishes the item it is working on.
+    """
+    results = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(results, (item, None), stopped):
+                    return
+            _put(results, (_END, None), stopped)
+        except BaseException as e:
+            _put(results, (_END, e), stopped)
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+
+    thread = threading.Thread(target=produce, name='statuter-pipeline')
+    thread.daemon = True
+    thread.start()
     try:
-        parser.parse(path)
-    except DocumentFinishedException:
-        pass
+        while True:
+            item, error = results.get()
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stopped.set()
+        # a generator left to the garbage collector can be finalized on its own thread
+        if thread is not threading.current_thread():
+            thread.join()
+
+
+def stream_pages(input_path, pages, workers=1, max_in_flight=None, backend='sax', cache=None,
+                 profiler=None, layout_template=None, queue_size=None):
+    """Yield (page_no, english_chunks, french_chunks) for each page in document order.
+
+    In a single process the chunks are lazy generators over the page's lines, so markdown
+    is produced only as the consumer writes it; each page's chunks must be consumed before
+    asking for the next page. With more than one worker, pages are parsed here and laid
+    out and rendered in a process pool, each language arriving as a single chunk; at most
+    max_in_flight pages (twice the workers by default) are submitted but not yet yielded.
+    With a statuter.profiler.Profiler, each page's stage timings and counts are added to it.
+    With a statuter.block.LayoutTemplate, pages reuse the previous page's column gap when it
+    fits them (in a pool, each worker carries its own) and the template counts the hits
+    and misses. With a queue_size, pages are parsed on a separate thread, up to queue_size
+    pages ahead of layout.
+    """
+    source_pages = _source_pages(input_path, pages, backend=backend, cache=cache,
+                                 profile=profiler is not None)
+    if queue_size:
+        source_pages = _threaded(source_pages, queue_size)
+    try:
+        if workers <= 1:
+            for page, laid_out, source_hash in source_pages:
+                page = _finish_page(page, laid_out, source_hash, cache, layout_template)
+                yield (page.page_no, page.iter_markdown(page.english),
+                       page.iter_markdown(page.french))
+                if profiler is not None:
+                    profiler.add_page(page.page_no, page.stats)
+        else:
+            max_in_flight = max_in_flight or 2 * workers
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                in_flight = collections.deque()
+                for page, laid_out, source_hash in source_pages:
+                    if len(in_flight) >= max_in_flight:
+                        for result in _collect_rendered(in_flight.popleft(), profiler,
+                                                        layout_template):
+                            yield result
+                    in_flight.append(executor.submit(_render_page, page, laid_out, source_hash,
+                                                     cache, layout_template is not None))
+
+                while in_flight:
+                    for result in _collect_rendered(in_flight.popleft(), profiler,
+                                                    layout_template):
+                        yield result
+        if cache is not None:
+            cache.evict()
+    finally:
+        source_pages.close()
+
+
+def _collect_rendered(future, profiler, layout_template):
+    page_no, english_markdown, french_markdown, stats, reused = future.result()
+    if profiler is not None:
+        profiler.add_page(page_no, stats)
+    if reused is not None:
+        if reused:
+            layout_template.hits += 1
+        else:
+            layout_template.misses += 1
+    yield page_no, [english_markdown], [french_markdown]
+
+
+def render_pages(input_path, pages, workers=1, max_in_flight=None, backend='sax', cache=None,
+                 profiler=None, layout_template=None):
+    """Yield (page_no, english_markdown, french_markdown) for each page in document order."""
+    streamed = stream_pages(input_path, pages, workers, max_in_flight, backend, cache, profiler,
+                            layout_template)
+    for page_no, english_chunks, french_chunks in streamed:
+        yield page_no, ''.join(english_chunks), ''.join(french_chunks)
+
 
-    if len(content_loader.page.words) < 10:
-        content_loader.page.words = []
+def _pipeline_pages(input_path, pages, workers=1, backend='sax', cache=None, profiler=None,
+                    layout_template=None, queue_size=DEFAULT_QUEUE_SIZE, use_reference=False):
+    """Like stream_pages, but with a queue_size, parsing runs on one thread, layout and
+    rendering on another, and the caller is left to write the markdown.
 
-    if content_loader.page.words != []:
-        content_loader.page.compute_column_margins()
-        content_loader.page.remove_troublesome_lines()
+    The stages pass pages through queues of queue_size, so while one page is written the
+    next ones are being laid out and parsed. With use_reference, pages are read and laid
+    out by statuter.reference instead, and the other settings are ignored.
+    """
+    if use_reference:
+        streamed = _reference_pages(input_path, pages)
+    else:
+        streamed = stream_pages(input_path, pages, workers, backend=backend, cache=cache,
+                                profiler=profiler, layout_template=layout_template,
+                                queue_size=queue_size)
+    if not queue_size:
+        return streamed
+    return _threaded(_rendered_pages(streamed), queue_size)
 
-    return content_loader.page
 
+def _reference_pages(input_path, pages):
+    for page in reference.iter_pages(input_path, pages):
+        yield (page.page_no, [page.convert_to_markdown(page.english)],
+               [page.convert_to_markdown(page.french)])
 
-def extract_pages(input_path, english_output, french_output, pages):
+
+def _rendered_pages(streamed):
+    try:
+        for page_no, english_chunks, french_chunks in streamed:
+            yield page_no, list(english_chunks), list(french_chunks)
+    finally:
+        streamed.close()
+
+
+def _write_chunks(chunks, files):
+    for chunk in chunks:
+        for output_file in files:
+            output_file.write(chunk)
+    for output_file in files:
+        output_file.flush()
+
+
+def extract_pages(input_path, english_output, french_output, pages, workers=1, backend='sax',
+                  cache=None, profiler=None, layout_template=None, queue_size=DEFAULT_QUEUE_SIZE,
+                  use_reference=False):
+    """Write the markdown of pages to english_output and french_output.
+
+    Parsing, layout and writing overlap, each stage running up to queue_size pages ahead of
+    the next (see _pipeline_pages); without a queue_size they run one after another. With
+    use_reference, the pages are those of the reference engine, statuter.reference.
+    """
     print("Beginning pages {}-{}".format(min(pages), max(pages)))
+    streamed = _pipeline_pages(input_path, pages, workers, backend, cache, profiler,
+                               layout_template, queue_size, use_reference)
     with open(english_output, 'w') as english_file:
         with open(french_output, 'w') as french_file:
-            for page_no in pages:
-                page = get_page(input_path, page_no)
-                english_markdown = page.convert_to_markdown(page.english)
-                english_file.write(english_markdown)
-
-                french_markdown = page.convert_to_markdown(page.french)
-                french_file.write(french_markdown)
+            for page_no, english_chunks, french_chunks in streamed:
+                _write_chunks(english_chunks, [english_file])
+                _write_chunks(french_chunks, [french_file])
                 print("Finished page {}".format(page_no))
     print("Finished pages {}-{}".format(min(pages), max(pages)))
+
+
+def extract_acts(input_path, acts, workers=1, backend='sax', cache=None, profiler=None,
+                 layout_template=None, queue_size=DEFAULT_QUEUE_SIZE, use_reference=False):
+    """Extract several acts, given as (english_output, french_output, pages) tuples, in one pass.
+
+    Every page in the union of the acts' page ranges is parsed, laid out and rendered once,
+    and its markdown is written to each act that includes it. An act's files are only held
+    open between its first and last page. Parsing, layout and writing overlap, and
+    use_reference selects the reference engine, as in extract_pages.
+    """
+    acts = [(english_output, french_output, list(pages))
+            for english_output, french_output, pages in acts]
+    pages = sorted(set(page_no for _, _, act_pages in acts for page_no in act_pages))
+
+    print("Beginning {} acts over {} pages".format(len(acts), len(pages)))
+    streamed = _pipeline_pages(input_path, pages, workers, backend, cache, profiler,
+                               layout_template, queue_size, use_reference)
+    write_acts(acts, streamed)
+    print("Finished {} acts".format(len(acts)))
+
+
+def write_acts(acts, streamed):
+    """Write streamed (page_no, english_chunks, french_chunks) to every act including the page."""
+    acts_by_page = collections.defaultdict(list)
+    for act_no, (_, _, pages) in enumerate(acts):
+        for page_no in pages:
+            acts_by_page[page_no].append(act_no)
+    last_pages = [max(pages) if pages else None for _, _, pages in acts]
+
+    open_files = {}
+    started = set()
+    try:
+        for page_no, english_chunks, french_chunks in streamed:
+            page_no = int(page_no)
+            for act_no in acts_by_page[page_no]:
+                if act_no not in open_files:
+                    english_output, french_output, _ = acts[act_no]
+                    open_files[act_no] = (open(english_output, 'w'), open(french_output, 'w'))
+                    started.add(act_no)
+
+            page_files = [open_files[act_no] for act_no in acts_by_page[page_no]]
+            _write_chunks(english_chunks, [english_file for english_file, _ in page_files])
+            _write_chunks(french_chunks, [french_file for _, french_file in page_files])
+
+            for act_no in acts_by_page[page_no]:
+                if page_no == last_pages[act_no]:
+                    english_file, french_file = open_files.pop(act_no)
+                    english_file.close()
+                    french_file.close()
+            print("Finished page {}".format(page_no))
+    finally:
+        for english_file, french_file in open_files.values():
+            english_file.close()
+            french_file.close()
+
+    for act_no, (english_output, french_output, _) in enumerate(acts):
+        if act_no not in started:
+            open(english_output, 'w').close()
+            open(french_output, 'w').close()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import mmap
+import os
+from statuter import sources
+from statuter.block import Line, Page
+from statuter.cache import layout_parameters
+from statuter.index import PAGE_PATTERN, PageIndex
+from statuter.loader import extract_acts, DEFAULT_QUEUE_SIZE
+
+
+FORMAT_VERSION = 2
+# bump whenever the markdown written for the same laid-out page changes
+OUTPUT_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+# longest <page ...> start tag looked for across a chunk boundary
+MAX_TAG_LENGTH = 1024
+
+
+def render_parameters():
+    """Everything besides its pages that an act's markdown depends on: the layout parameters,
+    the class constants used to assemble and render lines, and the output format version.
+    """
+    return layout_parameters() + [Line.MIN_VERTICAL_OVERLAP_FRACTION, Page.HEADER_CAP_THRESHOLD,
+                                  Page.HEADER_1_THRESHOLD_SIZE, Page.HEADER_2_THRESHOLD_SIZE,
+                                  OUTPUT_VERSION]
+
+
+def _indexed_page_hashes(path):
+    index = PageIndex.for_file(path)
+    hashes = {}
+    if index.size == 0:
+        return hashes
+
+    with open(path, 'rb') as xml_file:
+        with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with memoryview(data) as view:
+                for page_id, start, end in index.pages:
+                    hashes[page_id] = hashlib.sha256(view[start:end]).hexdigest()
+    return hashes
+
+
+def _streamed_page_hashes(chunks):
+    hashes = {}
+    buffer = b''
+    page_id = None
+    for chunk in chunks:
+        scan_from = max(1, len(buffer) - MAX_TAG_LENGTH)
+        buffer += chunk
+        while True:
+            match = PAGE_PATTERN.search(buffer, scan_from if page_id is not None else 0)
+            if match is None:
+                break
+            if page_id is not None:
+                hashes[page_id] = hashlib.sha256(buffer[:match.start()]).hexdigest()
+            page_id = match.group(1).decode('utf-8')
+            buffer = buffer[match.start():]
+            scan_from = 1
+        if page_id is None:
+            buffer = buffer[-MAX_TAG_LENGTH:]
+
+    if page_id is not None:
+        hashes[page_id] = hashlib.sha256(buffer).hexdigest()
+    return hashes
+
+
+def page_hashes(path):
+    """Return {page id: sha256 of the page's raw XML} for every page of the volume at path.
+
+    Uncompressed files are hashed through the page index; compressed ones in a single
+    streaming pass. Both hash the same bytes, so recompressing a volume changes nothing.
+    """
+    if sources.is_plain_file(path):
+        return _indexed_page_hashes(path)
+    return _streamed_page_hashes(sources.iter_chunks(path))
+
+
+class Manifest(object):
+    """The page hashes and page lists that a set of act outputs were extracted from.
+
+    Act outputs are stored relative to the manifest's directory, so an output tree can be
+    moved together with its manifest.
+    """
+
+    def __init__(self, path, parameters=None, pages=None, acts=None):
+        self.path = path
+        self.parameters = parameters
+        self.pages = pages or {}
+        self.acts = acts or {}
+
+    @classmethod
+    def load(cls, path):
+        """Return the manifest at path, or an empty one if it is missing, unreadable or outdated."""
+        try:
+            with open(path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return cls(path)
+
+        if data.get('version') != FORMAT_VERSION:
+            return cls(path)
+        return cls(path, data['parameters'], data['pages'], data['acts'])
+
+    def save(self):
+        data = {
+            'version': FORMAT_VERSION,
+            'parameters': self.parameters,
+            'pages': self.pages,
+            'acts': self.acts,
+        }
+        temporary_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump(data, manifest_file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def _key(self, output):
+        return os.path.relpath(output, os.path.dirname(os.path.abspath(self.path)))
+
+    def _record(self, english_output, french_output, pages):
+        return {'fra': self._key(french_output), 'pages': [str(page_no) for page_no in pages]}
+
+    def is_current(self, act, hashes):
+        """True if act's outputs exist and were extracted, with the current render parameters,
+        from the same pages as hashes holds.
+        """
+        english_output, french_output, pages = act
+        if self.parameters != render_parameters():
+            return False
+        if self.acts.get(self._key(english_output)) != self._record(*act):
+            return False
+        if not (os.path.exists(english_output) and os.path.exists(french_output)):
+            return False
+        return all(self.pages.get(str(page_no)) == hashes.get(str(page_no)) for page_no in pages)
+
+    def update(self, acts, hashes):
+        self.parameters = render_parameters()
+        self.acts = {}
+        self.pages = {}
+        for english_output, french_output, pages in acts:
+            self.acts[self._key(english_output)] = self._record(english_output, french_output, pages)
+            for page_no in pages:
+                self.pages[str(page_no)] = hashes.get(str(page_no))
+
+
+def manifest_path(english_output_dir):
+    """The default manifest location, next to the English output folder."""
+    return os.path.normpath(english_output_dir) + MANIFEST_SUFFIX
+
+
+def extract_changed_acts(input_path, acts, manifest_file, workers=1, backend='sax', cache=None,
+                         profiler=None, rebuild=False, layout_template=None,
+                         queue_size=DEFAULT_QUEUE_SIZE, use_reference=False):
+    """Like extract_acts, but only rewrite acts whose pages changed since the manifest was saved.
+
+    Returns the acts that were rewritten. The manifest is only saved once they have all
+    been written, so an interrupted run leaves them marked as changed.
+    """
+    acts = [(english_output, french_output, list(pages)) for english_output, french_output, pages in acts]
+    hashes = page_hashes(input_path)
+    manifest = Manifest.load(manifest_file)
+
+    changed = [act for act in acts if rebuild or not manifest.is_current(act, hashes)]
+    print("Skipping {} unchanged acts".format(len(acts) - len(changed)))
+    if changed:
+        extract_acts(input_path, changed, workers, backend, cache, profiler, layout_template,
+                     queue_size, use_reference)
+
+    manifest.update(acts, hashes)
+    manifest.save()
+    return changed
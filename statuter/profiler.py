@@ -0,0 +1,79 @@
+import functools
+import json
+import time
+
+
+DEFAULT_SLOWEST_PAGES = 20
+
+
+class PageStats(object):
+    """Per-stage durations and counters for one page, filled in while it is processed."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    def add_time(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @property
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+
+def timed(stage):
+    """Decorate a method to add its run time to self.stats when the object has stats."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.stats is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.stats.add_time(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class Profiler(object):
+    """Collects PageStats for every page of a run and reports them as JSON."""
+
+    def __init__(self):
+        self.pages = []
+        self._start = time.perf_counter()
+
+    def add_page(self, page_no, stats):
+        self.pages.append((str(page_no), stats))
+
+    def report(self, slowest=DEFAULT_SLOWEST_PAGES):
+        total_seconds, total_counts = {}, {}
+        page_records = []
+        for page_no, stats in self.pages:
+            for stage, seconds in stats.seconds.items():
+                total_seconds[stage] = total_seconds.get(stage, 0.0) + seconds
+            for name, value in stats.counts.items():
+                total_counts[name] = total_counts.get(name, 0) + value
+            page_records.append({
+                'page': page_no,
+                'total_seconds': stats.total_seconds,
+                'seconds': stats.seconds,
+                'counts': stats.counts,
+            })
+
+        return {
+            'wall_seconds': time.perf_counter() - self._start,
+            'pages': len(page_records),
+            'total_seconds': total_seconds,
+            'total_counts': total_counts,
+            'slowest_pages': sorted(page_records, key=lambda record: -record['total_seconds'])[:slowest],
+            'page_details': page_records,
+        }
+
+    def write(self, path, slowest=DEFAULT_SLOWEST_PAGES):
+        with open(path, 'w') as report_file:
+            json.dump(self.report(slowest), report_file, indent=2, sort_keys=True)
@@ -0,0 +1,170 @@
+import asyncio
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from statuter import sources
+from statuter.index import PageIndex
+from statuter.loader import render_chunks
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PAGES = 2048
+DEFAULT_WORKERS = 2
+# requests are single JSON lines; this bounds how much one client can make the server buffer
+MAX_REQUEST_BYTES = 2 ** 16
+
+
+def parse_page_range(pages):
+    """Return the page numbers of an 'x-y' range, or of a single page 'x'."""
+    bounds = [int(page) for page in str(pages).split('-')]
+    if len(bounds) == 1:
+        bounds.append(bounds[0])
+    if len(bounds) != 2 or bounds[0] > bounds[1]:
+        raise ValueError('Page range must be in x-y format: {}'.format(pages))
+    return range(bounds[0], bounds[1] + 1)
+
+
+class PageServer(object):
+    """Serves the markdown of page ranges of one volume, keeping its index and pages in memory.
+
+    Laid-out pages are kept, with their rendered markdown, in an LRU of max_pages entries.
+    Parsing and layout run in a thread pool so that the event loop keeps answering other
+    clients, and concurrent requests for the same page share a single parse. The index
+    and the LRU are reloaded if the input file changes on disk.
+    """
+
+    def __init__(self, path, backend='sax', max_pages=DEFAULT_MAX_PAGES, workers=DEFAULT_WORKERS):
+        if not sources.is_plain_file(path):
+            raise ValueError('The server reads pages through the page index, which needs an uncompressed file')
+        self.path = path
+        self.backend = backend
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pages = collections.OrderedDict()
+        self._loading = {}
+        self._index = PageIndex.for_file(path)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _refresh_index(self):
+        stat = os.stat(self.path)
+        if stat.st_size != self._index.size or stat.st_mtime_ns != self._index.mtime:
+            self._index = PageIndex.for_file(self.path)
+            self._pages.clear()
+
+    def _load_pages(self, index, page_numbers):
+        rendered = {}
+        for page_no in page_numbers:
+            entry = render_chunks(index.read_chunks([page_no]), page_no, self.backend)
+            if entry is not None:
+                rendered[page_no] = entry
+        return rendered
+
+    def _remember(self, page_no, entry):
+        self._pages[page_no] = entry
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    async def _fetch(self, page_numbers):
+        loop = asyncio.get_running_loop()
+        index = self._index
+        future = loop.run_in_executor(self._executor, self._load_pages, index, page_numbers)
+        for page_no in page_numbers:
+            self._loading[page_no] = future
+        try:
+            rendered = await future
+        finally:
+            for page_no in page_numbers:
+                if self._loading.get(page_no) is future:
+                    del self._loading[page_no]
+        if index is self._index:
+            for page_no, entry in rendered.items():
+                self._remember(page_no, entry)
+        return rendered
+
+    async def render(self, pages):
+        """Return [(page_no, english_markdown, french_markdown)] for the pages of the volume in pages."""
+        self._refresh_index()
+        wanted = [str(page_no) for page_no in pages if page_no in self._index]
+
+        entries, missing, pending = {}, [], []
+        for page_no in wanted:
+            if page_no in self._pages:
+                self._pages.move_to_end(page_no)
+                entries[page_no] = self._pages[page_no]
+                self.hits += 1
+            elif page_no in self._loading:
+                pending.append((page_no, self._loading[page_no]))
+                self.hits += 1
+            else:
+                missing.append(page_no)
+                self.misses += 1
+
+        if missing:
+            entries.update(await self._fetch(missing))
+        for page_no, future in pending:
+            entries[page_no] = (await asyncio.shield(future))[page_no]
+
+        return [(page_no, entries[page_no][1], entries[page_no][2]) for page_no in wanted]
+
+    async def respond(self, request):
+        """Answer one decoded JSON request: {"pages": "x-y"} or {"command": "stats"}."""
+        if request.get('command') == 'stats':
+            return {'ok': True, 'pages_cached': len(self._pages), 'hits': self.hits, 'misses': self.misses}
+
+        rendered = await self.render(parse_page_range(request['pages']))
+        return {
+            'ok': True,
+            'pages': [page_no for page_no, _, _ in rendered],
+            'eng': ''.join(english_markdown for _, english_markdown, _ in rendered),
+            'fra': ''.join(french_markdown for _, _, french_markdown in rendered),
+        }
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.respond(json.loads(line.decode('utf-8')))
+                except Exception as e:  # pylint: disable=broad-except
+                    # any failure, including one laying out a page, is reported to the client
+                    response = {'ok': False, 'error': '{}: {}'.format(type(e).__name__, e)}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening on a Unix socket at socket_path, or else on host:port."""
+        if socket_path is not None:
+            return await asyncio.start_unix_server(self.handle_client, socket_path, limit=MAX_REQUEST_BYTES)
+        return await asyncio.start_server(self.handle_client, host, port, limit=MAX_REQUEST_BYTES)
+
+
+def serve(path, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, backend='sax',
+          max_pages=DEFAULT_MAX_PAGES, workers=DEFAULT_WORKERS):
+    page_server = PageServer(path, backend, max_pages, workers)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(page_server.start(socket_path, host, port))
+    print("Serving {} on {}".format(path, socket_path or '{}:{}'.format(host, port)))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        page_server.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
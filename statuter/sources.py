@@ -0,0 +1,109 @@
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+READ_BUFFER_SIZE = 2 ** 16
+
+
+def _open_zstd(stream):
+    if zstandard is None:
+        raise ImportError('Reading zstd-compressed input requires the zstandard package')
+    return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+
+# (magic bytes, name, opener taking a binary stream and returning a decompressing stream)
+COMPRESSION_FORMATS = [
+    (b'\x1f\x8b', 'gzip', lambda stream: gzip.GzipFile(fileobj=stream, mode='rb')),
+    (b'BZh', 'bzip2', bz2.BZ2File),
+    (b'\xfd7zXZ\x00', 'xz', lzma.LZMAFile),
+    (b'\x28\xb5\x2f\xfd', 'zstd', _open_zstd),
+]
+MAGIC_LENGTH = max(len(magic) for magic, _, _ in COMPRESSION_FORMATS)
+
+
+class _HeadedStream(object):
+    """A read-only stream that returns already-consumed head bytes before the rest of a stream."""
+
+    def __init__(self, head, stream):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size=-1):
+        if not self._head:
+            return self._stream.read(size)
+
+        if size is None or size < 0:
+            data, self._head = self._head + self._stream.read(), b''
+        else:
+            data, self._head = self._head[:size], self._head[size:]
+        return data
+
+
+def _compression_format(head):
+    for magic, name, opener in COMPRESSION_FORMATS:
+        if head.startswith(magic):
+            return name, opener
+    return None, None
+
+
+def compression(source):
+    """Return the name of the compression format of a path, or None if it is plain XML."""
+    with open(source, 'rb') as source_file:
+        name, _ = _compression_format(source_file.read(MAGIC_LENGTH))
+    return name
+
+
+def is_plain_file(source):
+    """True for paths to uncompressed files, which support mmap and the page index."""
+    return not hasattr(source, 'read') and compression(source) is None
+
+
+def _stream_chunks(stream):
+    for chunk in iter(lambda: stream.read(READ_BUFFER_SIZE), b''):
+        yield chunk
+
+
+def _decompressed_chunks(stream):
+    head = stream.read(MAGIC_LENGTH)
+    _, opener = _compression_format(head)
+    stream = _HeadedStream(head, stream)
+    if opener is None:
+        return _stream_chunks(stream)
+    return _stream_chunks(opener(stream))
+
+
+def iter_chunks(source):
+    """Yield the XML bytes of source in chunks.
+
+    source is a path or a binary file object. gzip, bzip2, xz and zstd input is detected
+    from its magic bytes and decompressed as it is streamed; uncompressed files named by
+    path are read through mmap.
+    """
+    if hasattr(source, 'read'):
+        for chunk in _decompressed_chunks(source):
+            yield chunk
+        return
+
+    with open(source, 'rb') as source_file:
+        name, _ = _compression_format(source_file.read(MAGIC_LENGTH))
+        source_file.seek(0)
+
+        if name is not None:
+            for chunk in _decompressed_chunks(source_file):
+                yield chunk
+            return
+
+        if os.fstat(source_file.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), READ_BUFFER_SIZE):
+                yield data[start:start + READ_BUFFER_SIZE]
@@ -0,0 +1,129 @@
+import math
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+
+PAGE_BBOX = (0.0, 0.0, 306.0, 397.0)
+ENGLISH_COLUMN = (30.8, 142.0)
+FRENCH_COLUMN = (149.4, 261.0)
+TEXT_BOTTOM, TEXT_TOP = 30.0, 360.0
+HEADER_BOTTOM, FOOTER_BOTTOM = 376.0, 12.0
+MAX_SIZE = 5.2
+CHAR_WIDTH_FRACTION = 0.57
+LINE_SPACING_FRACTION = 1.25
+# share of a column line covered by characters rather than spaces and ragged ends
+LINE_FILL_FRACTION = 0.75
+
+ENGLISH_WORDS = ('the', 'court', 'shall', 'judge', 'admiralty', 'vessel', 'Canada', 'any', 'of', 'and',
+                 'in', 'means', 'action', 'person', 'order', 'Minister', 'may', 'provision', 'section',
+                 'jurisdiction', 'proceedings', 'appeal', 'or', 'to', 'by', 'under', 'Act')
+FRENCH_WORDS = ('la', 'cour', 'doit', 'juge', 'amiraute', 'navire', 'Canada', 'tout', 'de', 'et', 'dans',
+                'designe', 'action', 'personne', 'ordonnance', 'ministre', 'peut', 'disposition', 'article',
+                'competence', 'procedures', 'appel', 'ou', 'au', 'par', 'en', 'Loi')
+ENGLISH_HEADINGS = ('INTERPRETATION', 'CONSTITUTION OF COURT', 'JURISDICTION', 'PRACTICE AND PROCEDURE')
+FRENCH_HEADINGS = ('INTERPRETATION', 'CONSTITUTION DE LA COUR', 'COMPETENCE', 'PRATIQUE ET PROCEDURE')
+
+
+class _PageWriter(object):
+
+    def __init__(self, output, rng, fonts, size):
+        self._output = output
+        self._rng = rng
+        self._fonts = fonts
+        self.size = size
+        self.char_width = size * CHAR_WIDTH_FRACTION
+        self.characters = 0
+
+    def word(self, text, left, bottom, size=None, font=None):
+        size = size or self.size
+        font = font or self._fonts[0]
+        width = size * CHAR_WIDTH_FRACTION
+        for i, char in enumerate(text):
+            char_left = left + i * width
+            self._output.write('        <text font={} bbox="{:.3f},{:.3f},{:.3f},{:.3f}" size="{:.3f}">{}</text>\n'.format(
+                quoteattr(font), char_left, bottom, char_left + width, bottom + size, size, escape(char)))
+        self.characters += len(text)
+        return left + len(text) * width
+
+    def line(self, words, column, bottom):
+        left, right = column
+        x = left
+        for text in words:
+            if x + len(text) * self.char_width > right:
+                break
+            x = self.word(text, x, bottom, font=self._rng.choice(self._fonts)) + self.char_width
+
+
+def _column_text(rng, vocabulary, width, char_width):
+    words, length = [], 0.0
+    while True:
+        text = rng.choice(vocabulary)
+        length += (len(text) + 1) * char_width
+        if length > width:
+            return words
+        words.append(text)
+
+
+def write_page(output, page_id, rng, chars_per_page=3000, fonts=('Courier',), running_headers=True):
+    """Write one bilingual two-column <page> with roughly chars_per_page characters."""
+    column_width = ENGLISH_COLUMN[1] - ENGLISH_COLUMN[0]
+    text_height = TEXT_TOP - TEXT_BOTTOM
+    # chars = 2 columns * fill * (width / char width) * (height / line spacing), solved for the size
+    size = math.sqrt(2 * LINE_FILL_FRACTION * column_width * text_height /
+                     (CHAR_WIDTH_FRACTION * LINE_SPACING_FRACTION * max(chars_per_page, 1)))
+    size = min(size, MAX_SIZE)
+    spacing = size * LINE_SPACING_FRACTION
+
+    output.write('    <page id="{}" bbox="{:.3f},{:.3f},{:.3f},{:.3f}" rotate="0">\n'.format(page_id, *PAGE_BBOX))
+    output.write('      <figure name="Xf{}" bbox="{:.3f},{:.3f},{:.3f},{:.3f}">\n'.format(page_id, *PAGE_BBOX))
+    writer = _PageWriter(output, rng, list(fonts), size)
+
+    if running_headers:
+        writer.word('Chap.', ENGLISH_COLUMN[0], HEADER_BOTTOM)
+        writer.word('A-1', ENGLISH_COLUMN[0] + 17.0, HEADER_BOTTOM)
+        writer.word('Admiralty/Amiraute', 120.0, HEADER_BOTTOM)
+        writer.word('Chap.', 220.0, HEADER_BOTTOM)
+        writer.word(str(page_id), 144.0, FOOTER_BOTTOM)
+
+    bottom = TEXT_TOP - size
+    section = 1
+    while bottom >= TEXT_BOTTOM and writer.characters < chars_per_page:
+        roll = rng.random()
+        if roll < 0.03 and bottom - 2 * spacing >= TEXT_BOTTOM:
+            heading = rng.randrange(len(ENGLISH_HEADINGS))
+            writer.line(ENGLISH_HEADINGS[heading].split(), ENGLISH_COLUMN, bottom)
+            writer.line(FRENCH_HEADINGS[heading].split(), FRENCH_COLUMN, bottom)
+        else:
+            english = _column_text(rng, ENGLISH_WORDS, column_width, writer.char_width)
+            french = _column_text(rng, FRENCH_WORDS, column_width, writer.char_width)
+            if roll < 0.08:
+                english[0:0] = ['{}.'.format(section)]
+                french[0:0] = ['{}.'.format(section)]
+                section += 1
+            elif roll < 0.12:
+                english[0:0] = ['(a)']
+                french[0:0] = ['(a)']
+            writer.line(english, ENGLISH_COLUMN, bottom)
+            writer.line(french, FRENCH_COLUMN, bottom)
+        bottom -= spacing
+
+    output.write('      </figure>\n')
+    output.write('    </page>\n')
+    return writer.characters
+
+
+def write_volume(path, pages=10, chars_per_page=3000, fonts=('Courier',), running_headers=True, seed=0,
+                 first_page=1):
+    """Write a synthetic RSC XML volume shaped like the pdfminer exports statuter reads.
+
+    Each page holds an English and a French column of dictionary words separated by a
+    fixed gutter, with occasional headings, numbered sections and lettered paragraphs,
+    and optionally a running header and footer that cross the gutter.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w') as output:
+        output.write('<?xml version="1.0" encoding="utf-8" ?>\n  <pages>\n')
+        for page_id in range(first_page, first_page + pages):
+            write_page(output, page_id, rng, chars_per_page, fonts, running_headers)
+        output.write('  </pages>\n')
+    return path
@@ -0,0 +1,90 @@
+import collections
+import itertools
+import time
+from statuter import reference, sources
+from statuter.block import LayoutTemplate
+from statuter.index import PageIndex
+from statuter.loader import iter_pages
+
+
+Engine = collections.namedtuple('Engine', ['name', 'backend', 'use_index', 'reuse_layout'])
+
+# the reference engine is the frozen original code in statuter.reference, which reads every
+# page with the SAX parser, scanning the whole file, and sweeps each page for its margins;
+# its settings describe that code and cannot be changed. Other engines must give the same pages
+REFERENCE = Engine('reference', 'sax', False, False)
+FAST = Engine('fast', 'expat', True, True)
+ENGINES = {engine.name: engine for engine in (REFERENCE, FAST)}
+
+FIELDS = ('eng', 'fra', 'margins', 'words')
+
+PageDifference = collections.namedtuple('PageDifference', ['page_no', 'fields'])
+
+
+def engine_pages(source, pages, engine, cache=None):
+    """Yield the laid-out pages of source that engine gives: those of statuter.reference for
+    the reference engine, and otherwise those iter_pages gives with engine's settings.
+    """
+    if engine == REFERENCE:
+        return reference.iter_pages(source, pages)
+    layout_template = LayoutTemplate() if engine.reuse_layout else None
+    return iter_pages(source, pages, engine.use_index, engine.backend, cache, layout_template)
+
+
+def page_summary(page):
+    """Return {field: value} for the parts of a laid-out page that engines must agree on."""
+    return {
+        'eng': page.convert_to_markdown(page.english),
+        'fra': page.convert_to_markdown(page.french),
+        'margins': (page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge),
+        'words': [(word.text, word.left, word.right, word.bottom, word.top) for word in page.words],
+    }
+
+
+def _timed(pages, seconds, name):
+    pages = iter(pages)
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        seconds[name] += time.perf_counter() - start
+        if page is None:
+            return
+        yield page
+
+
+def compare_engines(source, pages=None, engine=FAST, reference=REFERENCE, cache=None,
+                    seconds=None):
+    """Yield a PageDifference for each page whose summary differs between engine and reference.
+
+    Both engines read source, a path, one page at a time. fields names the parts of
+    page_summary that differ, or is ('page',) for a page only one engine found. Without
+    pages, every page of an uncompressed file is compared. cache is only used by engine, so
+    that pages it laid out on an earlier run are checked too; the reference engine never
+    uses it. If given, seconds is a
+    collections.Counter that the time each engine took is added to, under 'reference' and
+    'engine'.
+    """
+    if pages is None:
+        if not sources.is_plain_file(source):
+            raise ValueError('Pages must be given for compressed input')
+        pages = [page_id for page_id, _, _ in PageIndex.for_file(source).pages]
+    pages = list(pages)
+    seconds = collections.Counter() if seconds is None else seconds
+
+    reference_pages = _timed(engine_pages(source, pages, reference), seconds, 'reference')
+    checked_pages = _timed(engine_pages(source, pages, engine, cache), seconds, 'engine')
+    # summaries of pages read by one engine but not yet by the other, normally at most one
+    pending = ({}, {})
+    for read in itertools.zip_longest(reference_pages, checked_pages):
+        for summaries, page in zip(pending, read):
+            if page is not None:
+                summaries[page.page_no] = page_summary(page)
+
+        for page_no in [page_no for page_no in pending[0] if page_no in pending[1]]:
+            expected, summary = pending[0].pop(page_no), pending[1].pop(page_no)
+            fields = tuple(field for field in FIELDS if expected[field] != summary[field])
+            if fields:
+                yield PageDifference(page_no, fields)
+
+    for page_no in itertools.chain(*pending):
+        yield PageDifference(page_no, ('page',))
@@ -0,0 +1,35 @@
+from statuter.backends import BACKENDS
+from statuter.cache import PageCache, DEFAULT_MAX_BYTES
+from statuter.profiler import Profiler
+from statuter import batch
+import argparse
+
+parser = argparse.ArgumentParser(description='Extract RSC textual data from many volumes at once.')
+parser.add_argument('volumes', help='CSV file with Volume, TOC, English and French columns: an '
+                                    'uncompressed RSC xml file, its table of contents CSV and its '
+                                    'two output markdown folders, relative to this file')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of processes used to parse, lay out and render pages')
+parser.add_argument('--backend', choices=sorted(BACKENDS), default='sax',
+                    help='XML parser used to read the input')
+parser.add_argument('--max-pages', type=int, default=batch.DEFAULT_MAX_PAGES_IN_FLIGHT,
+                    help='Most pages submitted to the workers but not yet written')
+parser.add_argument('--max-memory', type=int, default=batch.DEFAULT_MAX_BYTES_IN_FLIGHT // 2 ** 20,
+                    help='Most MiB of page XML submitted to the workers but not yet written')
+parser.add_argument('--cache', help='Directory of laid-out pages to reuse between runs')
+parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                    help='Maximum size of the page cache in MiB')
+parser.add_argument('--reuse-layout', action='store_true',
+                    help="Skip the column sweep on pages where the previous page's column "
+                         "margins still hold")
+parser.add_argument('--profile', help='Write per-stage timings and counters for every page to this JSON file')
+
+input_args = parser.parse_args()
+cache = PageCache(input_args.cache, input_args.cache_size * 2 ** 20) if input_args.cache else None
+profiler = Profiler() if input_args.profile else None
+
+batch.run_batch(batch.read_volumes(input_args.volumes), input_args.workers, input_args.backend,
+                input_args.max_pages, input_args.max_memory * 2 ** 20, cache, profiler,
+                input_args.reuse_layout)
+if profiler is not None:
+    profiler.write(input_args.profile)
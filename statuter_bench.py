@@ -0,0 +1,52 @@
+from statuter.backends import BACKENDS
+from statuter import benchmark
+import sys
+import argparse
+
+parser = argparse.ArgumentParser(description='Benchmark each stage of RSC extraction.')
+parser.add_argument('--input', help='RSC xml file to benchmark instead of a generated volume')
+parser.add_argument('--pages', type=int, default=20, help='Pages in the generated volume')
+parser.add_argument('--chars-per-page', type=int, default=3000, help='Characters per generated page')
+parser.add_argument('--fonts', default='Courier,Times-Roman', help='Comma-separated fonts of the generated volume')
+parser.add_argument('--no-headers', action='store_true', help='Leave out running headers and footers')
+parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated volume')
+parser.add_argument('--backend', choices=sorted(BACKENDS), default='sax',
+                    help='XML parser used to read the input')
+parser.add_argument('--scaling', nargs='?',
+                    const=','.join(str(chars) for chars in benchmark.DEFAULT_SCALING_CHARS),
+                    help='Report the time per character of generated volumes with each of these '
+                         'comma-separated characters per page (default: 1000 to 16000)')
+parser.add_argument('--memory', action='store_true', help='Also record the peak allocation of each stage')
+parser.add_argument('--save', help='Write the results to this baseline file')
+parser.add_argument('--compare', help='Fail if any stage is slower than in this baseline file')
+parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE,
+                    help='Allowed slowdown against the baseline, as a fraction')
+
+input_args = parser.parse_args()
+
+if input_args.scaling:
+    chars_per_page = [int(chars) for chars in input_args.scaling.split(',')]
+    runs = benchmark.run_scaling_benchmark(chars_per_page, input_args.pages, input_args.fonts.split(','),
+                                           not input_args.no_headers, input_args.seed,
+                                           input_args.backend)
+    print(benchmark.format_scaling(runs))
+    sys.exit(0)
+
+if input_args.input:
+    results = benchmark.run_benchmark(input_args.input, backend=input_args.backend, memory=input_args.memory)
+else:
+    results = benchmark.run_synthetic_benchmark(input_args.pages, input_args.chars_per_page,
+                                                input_args.fonts.split(','), not input_args.no_headers,
+                                                input_args.seed, input_args.backend, input_args.memory)
+
+print(benchmark.format_results(results))
+
+if input_args.save:
+    benchmark.save_baseline(results, input_args.save)
+
+if input_args.compare:
+    regressions = benchmark.compare(results, benchmark.load_baseline(input_args.compare), input_args.tolerance)
+    for stage, expected, seconds in regressions:
+        print('Regression in {}: {:.3f} s against a baseline of {:.3f} s'.format(stage, seconds, expected))
+    if regressions:
+        sys.exit(1)
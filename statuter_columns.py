@@ -0,0 +1,26 @@
+from statuter.backends import BACKENDS
+from statuter.batch import page_range
+from statuter.cache import PageCache, DEFAULT_MAX_BYTES
+from statuter.columnar import export_columns
+import sys
+import argparse
+
+parser = argparse.ArgumentParser(description='Export the lines and words of RSC pages as columns.')
+parser.add_argument('input', help='Input RSC xml file, optionally gzip, bzip2, xz or zstd compressed, '
+                                  'or - to read from standard input')
+parser.add_argument('output', help='Output .npz archive, or directory of .npy files')
+parser.add_argument('--pages', help='Page numbers in x-y format (default: every page of an '
+                                    'uncompressed input)')
+parser.add_argument('--backend', choices=sorted(BACKENDS), default='sax',
+                    help='XML parser used to read the input')
+parser.add_argument('--cache', help='Directory of laid-out pages to reuse between runs')
+parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                    help='Maximum size of the page cache in MiB')
+
+input_args = parser.parse_args()
+source = sys.stdin.buffer if input_args.input == '-' else input_args.input
+cache = PageCache(input_args.cache, input_args.cache_size * 2 ** 20) if input_args.cache else None
+pages = page_range(input_args.pages) if input_args.pages else None
+
+export = export_columns(source, input_args.output, pages, input_args.backend, cache)
+print("Exported {} lines and {} words".format(len(export.lines['page']), len(export.words['page'])))
@@ -1,15 +1,55 @@
-from statuter.loader import extract_pages
+from statuter.backends import BACKENDS
+from statuter.batch import read_toc
+from statuter.block import LayoutTemplate
+from statuter.cache import PageCache, DEFAULT_MAX_BYTES
+from statuter.loader import extract_acts, DEFAULT_QUEUE_SIZE
+from statuter.manifest import extract_changed_acts, manifest_path
+from statuter.profiler import Profiler
+from statuter.verify import ENGINES, REFERENCE
 import os
+import sys
 import argparse
-import csv
 
 parser = argparse.ArgumentParser(description='Extract RSC textual data.')
-parser.add_argument('input', help='Input RSC xml file')
+parser.add_argument('input', help='Input RSC xml file, optionally gzip, bzip2, xz or zstd compressed, '
+                                   'or - to read from standard input')
 parser.add_argument('toc', help='Input RSC table of contents CSV file')
 parser.add_argument('eng', help='Output English markdown folder')
 parser.add_argument('fra', help='Output French markdown folder')
 
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of processes used to lay out and render pages')
+parser.add_argument('--engine', choices=sorted(ENGINES),
+                    help="Extract with this engine's backend and layout settings, as checked by "
+                         "statuter_verify.py; the reference engine is statuter's original code")
+parser.add_argument('--backend', choices=sorted(BACKENDS),
+                    help="XML parser used to read the input (default: sax, or the engine's)")
+parser.add_argument('--cache', help='Directory of laid-out pages to reuse between runs')
+parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                    help='Maximum size of the page cache in MiB')
+parser.add_argument('--manifest', help='Page hashes of the previous run, used to only rewrite acts whose '
+                                       'pages changed (default: next to the English folder)')
+parser.add_argument('--rebuild', action='store_true', help='Rewrite every act even if its pages are unchanged')
+parser.add_argument('--reuse-layout', action='store_true',
+                    help="Skip the column sweep on pages where the previous page's column "
+                         "margins still hold")
+parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                    help='Pages that parsing and layout may run ahead of writing; 0 runs them '
+                         'one after another')
+parser.add_argument('--profile', help='Write per-stage timings and counters for every page to this JSON file')
+
 input_args = parser.parse_args()
+engine = ENGINES[input_args.engine] if input_args.engine else None
+if engine == REFERENCE and (input_args.workers > 1 or input_args.backend or input_args.cache or
+                            input_args.reuse_layout or input_args.profile):
+    parser.error('The reference engine cannot be combined with --workers, --backend, --cache, '
+                 '--reuse-layout or --profile')
+backend = input_args.backend or (engine.backend if engine else 'sax')
+source = sys.stdin.buffer if input_args.input == '-' else input_args.input
+cache = PageCache(input_args.cache, input_args.cache_size * 2 ** 20) if input_args.cache else None
+profiler = Profiler() if input_args.profile else None
+reuse_layout = input_args.reuse_layout or (engine is not None and engine.reuse_layout)
+layout_template = LayoutTemplate() if reuse_layout else None
 current_dir = os.path.dirname(os.path.realpath(__file__))
 
 eng = input_args.eng
@@ -25,14 +65,17 @@ if not os.path.exists(eng):
 if not os.path.exists(fra):
     os.mkdir(fra)
 
-def page_range(pages):
-    pages = pages.split('-')
-    pages = [int(page) for page in pages]
-    return range(pages[0], pages[1] + 1)
-
-with open(input_args.toc, 'r') as toc_file:
-    toc = csv.DictReader(toc_file)
-    for act in toc:
+acts = read_toc(input_args.toc, eng, fra)
 
-        extract_pages(input_args.input, os.path.join(eng, act['Chapter'] + '.md'),
-                      os.path.join(fra, act['Chapter'] + '.md'), page_range(act['Pages']))
+if input_args.input == '-':
+    extract_acts(source, acts, input_args.workers, backend, cache, profiler,
+                 layout_template, input_args.queue_size, engine == REFERENCE)
+else:
+    extract_changed_acts(source, acts, input_args.manifest or manifest_path(eng), input_args.workers,
+                         backend, cache, profiler, input_args.rebuild, layout_template,
+                         input_args.queue_size, engine == REFERENCE)
+if profiler is not None:
+    profiler.write(input_args.profile)
+if layout_template is not None:
+    print("Reused column margins for {} of {} pages".format(
+        layout_template.hits, layout_template.hits + layout_template.misses))
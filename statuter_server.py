@@ -0,0 +1,24 @@
+from statuter.backends import BACKENDS
+from statuter import server
+import argparse
+
+parser = argparse.ArgumentParser(description='Serve RSC page ranges as markdown from a warm process.',
+                                 epilog='Clients send one JSON request per line, such as {"pages": "24-30"}, '
+                                        'and receive one JSON line with the English ("eng") and French '
+                                        '("fra") markdown of those pages. {"command": "stats"} reports '
+                                        'cache hits and misses.')
+parser.add_argument('input', help='Input RSC xml file (uncompressed)')
+parser.add_argument('--socket', help='Listen on this Unix socket instead of TCP')
+parser.add_argument('--host', default=server.DEFAULT_HOST, help='TCP address to listen on')
+parser.add_argument('--port', type=int, default=server.DEFAULT_PORT, help='TCP port to listen on')
+parser.add_argument('--backend', choices=sorted(BACKENDS), default='sax',
+                    help='XML parser used to read the input')
+parser.add_argument('--max-pages', type=int, default=server.DEFAULT_MAX_PAGES,
+                    help='Number of laid-out pages kept in memory')
+parser.add_argument('--workers', type=int, default=server.DEFAULT_WORKERS,
+                    help='Number of threads used to parse and lay out pages')
+
+input_args = parser.parse_args()
+
+server.serve(input_args.input, input_args.socket, input_args.host, input_args.port, input_args.backend,
+             input_args.max_pages, input_args.workers)
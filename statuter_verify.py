@@ -0,0 +1,41 @@
+from statuter.backends import BACKENDS
+from statuter.batch import page_range
+from statuter.cache import PageCache, DEFAULT_MAX_BYTES
+from statuter.verify import ENGINES, compare_engines
+import collections
+import sys
+import argparse
+
+parser = argparse.ArgumentParser(description='Check that an RSC extraction engine gives the same '
+                                             'pages as the reference engine.')
+parser.add_argument('input',
+                    help='Input RSC xml file, optionally gzip, bzip2, xz or zstd compressed')
+parser.add_argument('--pages', help='Page numbers in x-y format (default: every page of an '
+                                    'uncompressed input)')
+parser.add_argument('--engine', choices=sorted(ENGINES), default='fast',
+                    help='Engine checked against the reference engine')
+parser.add_argument('--backend', choices=sorted(BACKENDS),
+                    help="XML parser used by the checked engine instead of the engine's own")
+parser.add_argument('--cache',
+                    help='Directory of laid-out pages the checked engine reuses between runs')
+parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                    help='Maximum size of the page cache in MiB')
+
+input_args = parser.parse_args()
+engine = ENGINES[input_args.engine]
+if input_args.backend:
+    if engine.name == 'reference':
+        parser.error("The reference engine's backend cannot be changed")
+    engine = engine._replace(backend=input_args.backend)
+cache = PageCache(input_args.cache, input_args.cache_size * 2 ** 20) if input_args.cache else None
+pages = page_range(input_args.pages) if input_args.pages else None
+
+seconds = collections.Counter()
+differences = 0
+for difference in compare_engines(input_args.input, pages, engine, cache=cache, seconds=seconds):
+    differences += 1
+    print("Page {} differs: {}".format(difference.page_no, ', '.join(difference.fields)))
+
+print("{} pages differ; reference took {:.2f} s, {} took {:.2f} s".format(
+    differences, seconds['reference'], engine.name, seconds['engine']))
+sys.exit(1 if differences else 0)
@@ -0,0 +1,22 @@
+import os
+import shutil
+import pytest
+
+FIXTURES = os.path.dirname(os.path.realpath(__file__))
+
+
+def _fixture_copy(tmpdir, name):
+    # reading a file writes its page index next to it, so tests read copies in tmpdir
+    path = str(tmpdir.join(name))
+    shutil.copy(os.path.join(FIXTURES, name), path)
+    return path
+
+
+@pytest.fixture
+def layout_path(tmpdir):
+    return _fixture_copy(tmpdir, 'layout_fixture.xml')
+
+
+@pytest.fixture
+def content_path(tmpdir):
+    return _fixture_copy(tmpdir, 'content_fixture.xml')
@@ -0,0 +1,121 @@
+import os
+import shutil
+from concurrent.futures import Future
+import pytest
+from statuter import batch, loader
+from statuter.cache import PageCache
+from statuter.profiler import Profiler
+
+
+FIXTURES = os.path.dirname(os.path.realpath(__file__))
+
+
+@pytest.fixture
+def batch_path(tmpdir):
+    rows = ['Volume,TOC,English,French']
+    for volume, chapters in (('layout', [('A-1', '23-24'), ('A-2', '24-24')]),
+                             ('content', [('C-1', '24-24'), ('C-2', '30-31')])):
+        shutil.copy(os.path.join(FIXTURES, volume + '_fixture.xml'), str(tmpdir.join(volume + '.xml')))
+        tmpdir.join(volume + '.csv').write(
+            'Chapter,Pages\n' + ''.join('{},{}\n'.format(*chapter) for chapter in chapters))
+        rows.append('{0}.xml,{0}.csv,{0}/eng,{0}/fra'.format(volume))
+    path = tmpdir.join('batch.csv')
+    path.write('\n'.join(rows) + '\n')
+    return str(path)
+
+
+class RecordingExecutor(object):
+    """Runs tasks on submit, recording how many were outstanding at most."""
+
+    def __init__(self):
+        self.submitted = []
+        self.outstanding = []
+        self.most_outstanding = 0
+
+    def submit(self, function, task):
+        future = Future()
+        future.set_result(function(task))
+        self.submitted.append(task)
+        self.outstanding.append(task)
+        self.most_outstanding = max(self.most_outstanding, len(self.outstanding))
+        original_result = future.result
+        future.result = lambda: self.outstanding.remove(task) or original_result()
+        return future
+
+
+def test_read_volumes(batch_path, tmpdir):
+    volumes = batch.read_volumes(batch_path)
+    assert [os.path.basename(volume.path) for volume in volumes] == ['layout.xml', 'content.xml']
+    assert volumes[0].english == str(tmpdir.join('layout', 'eng'))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_matches_extract_acts(batch_path, tmpdir, workers):
+    volumes = batch.read_volumes(batch_path)
+    report = batch.run_batch(volumes, workers)
+    assert (report['volumes'], report['acts'], report['pages']) == (2, 4, 3)
+    assert report['pages_per_second'] > 0
+
+    for volume in volumes:
+        expected_dir = tmpdir.mkdir('expected-' + os.path.basename(volume.path))
+        acts = batch.read_toc(volume.toc, str(expected_dir), str(expected_dir))
+        expected_acts = [(english + '.eng', french + '.fra', pages) for english, french, pages in acts]
+        loader.extract_acts(volume.path, expected_acts)
+        for (english, french, _), (expected_english, expected_french, _) in zip(
+                batch.read_toc(volume.toc, volume.english, volume.french), expected_acts):
+            assert open(english).read() == open(expected_english).read()
+            assert open(french).read() == open(expected_french).read()
+
+    assert open(os.path.join(volumes[1].english, 'C-2.md')).read() == ''
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_batch_uses_cache_and_profiler(batch_path, tmpdir, workers):
+    volumes = batch.read_volumes(batch_path)
+    cache = PageCache(str(tmpdir.join('cache')))
+    batch.run_batch(volumes, workers, cache=cache, reuse_layout=True)
+    first_run = [open(os.path.join(volumes[0].english, 'A-1.md')).read()]
+
+    profiler = Profiler()
+    batch.run_batch(volumes, workers, cache=cache, profiler=profiler, reuse_layout=True)
+    report = profiler.report()
+    assert report['pages'] == 3
+    assert report['total_counts']['cached_pages'] == 3
+    assert [open(os.path.join(volumes[0].english, 'A-1.md')).read()] == first_run
+
+
+def test_schedule_limits_work_in_flight(batch_path):
+    volumes = batch.read_volumes(batch_path)
+    index = batch.PageIndex.for_file(volumes[0].path)
+    tasks = list(batch._volume_tasks(0, index, [(None, None, [23, 24])], 'sax')) * 3
+    page_bytes = max(task.end - task.start for task in tasks)
+
+    executor = RecordingExecutor()
+    results = list(batch.schedule(tasks, executor, max_pages=4, max_bytes=10 ** 9))
+    assert [task for task, _ in results] == tasks
+    assert executor.most_outstanding == 4
+
+    executor = RecordingExecutor()
+    list(batch.schedule(tasks, executor, max_pages=4, max_bytes=page_bytes))
+    assert executor.most_outstanding == 1
+
+
+def test_schedule_submits_dense_pages_first(batch_path):
+    volumes = batch.read_volumes(batch_path)
+    index = batch.PageIndex.for_file(volumes[0].path)
+    task = next(batch._volume_tasks(0, index, [(None, None, [24])], 'sax'))
+    tasks = [task._replace(characters=characters) for characters in (100, 3000, 5, 500)]
+
+    executor = RecordingExecutor()
+    results = list(batch.schedule(tasks, executor, workers=1))
+    assert [task for task, _ in results] == tasks
+    assert [task.characters for task in executor.submitted] == [3000, 100, 500]
+    assert results[2][1] == ('24', '', '', None)
+
+
+def test_compressed_volumes_are_rejected(tmpdir):
+    path = str(tmpdir.join('volume.xml.gz'))
+    with open(path, 'wb') as compressed_file:
+        compressed_file.write(b'\x1f\x8b\x08\x00')
+    with pytest.raises(ValueError):
+        batch.run_batch([batch.Volume(path, None, str(tmpdir), str(tmpdir))])
@@ -0,0 +1,39 @@
+import os
+from statuter import benchmark, synthetic
+
+
+def test_run_benchmark(tmpdir):
+    path = synthetic.write_volume(str(tmpdir.join('volume.xml')), pages=2, chars_per_page=1500)
+    results = benchmark.run_benchmark(path, memory=True)
+
+    assert results['pages'] == 2
+    assert results['laid_out_pages'] == 2
+    assert results['characters'] > 2000
+    for stage in benchmark.STAGES:
+        assert results['stages'][stage]['seconds'] > 0
+        assert results['stages'][stage]['peak_bytes'] > 0
+
+
+def test_compare_against_saved_baseline(tmpdir):
+    results = benchmark.run_synthetic_benchmark(pages=2, chars_per_page=1500)
+    path = str(tmpdir.join('baseline.json'))
+    benchmark.save_baseline(results, path)
+    assert os.path.exists(path)
+
+    baseline = benchmark.load_baseline(path)
+    assert benchmark.compare(results, baseline) == []
+
+    baseline['stages']['parse']['seconds'] = results['stages']['parse']['seconds'] / 2
+    regressions = benchmark.compare(results, baseline)
+    assert [stage for stage, _, _ in regressions] == ['parse']
+
+
+def test_run_scaling_benchmark():
+    runs = benchmark.run_scaling_benchmark(chars_per_page=(1000, 2000), pages=1)
+
+    assert [run['volume']['chars_per_page'] for run in runs] == [1000, 2000]
+    assert runs[0]['characters'] < runs[1]['characters']
+    for run in runs:
+        for timing in run['stages'].values():
+            assert timing['seconds_per_character'] == timing['seconds'] / run['characters']
+    assert len(benchmark.format_scaling(runs).splitlines()) == len(benchmark.STAGES) + 1
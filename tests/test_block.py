@@ -1,3 +1,4 @@
+import pickle
 import pytest
 from statuter.block import Character, Word, Line, Page
 
@@ -82,6 +83,26 @@ class TestWord(object):
     def test_mode_font(self, simple_word):
         assert simple_word.mode_font == 'Courier'
 
+    def test_pickle(self, simple_word):
+        word = pickle.loads(pickle.dumps(simple_word))
+        assert not hasattr(word, '__dict__')
+        assert (word.text, word.left, word.right, word.mean_size) == ('fo', 1.0, 1.2, 5.25)
+
+    def test_mode_font_updates_as_characters_are_added(self):
+        w = Word()
+        w.add_character(Character(1.0, 1.1, 10.0, 10.5, font='Times', text='a'))
+        assert w.mode_font == 'Times'
+        w.add_character(Character(1.1, 1.2, 10.0, 10.5, font='Arial', text='b'))
+        assert w.mode_font == 'Arial'
+        w.add_character(Character(1.2, 1.3, 10.0, 10.5, font='Times', text='c'))
+        assert w.mode_font == 'Times'
+
+    def test_fraction_capitalized(self):
+        w = Word()
+        for i, text in enumerate('ABc1'):
+            w.add_character(Character(1.0 + i / 10.0, 1.1 + i / 10.0, 10.0, 10.5, text=text))
+        assert w.fraction_capitalized == 2.0 / 3
+
 
 class TestPage(object):
 
@@ -98,6 +119,106 @@ class TestPage(object):
         assert page.bottom == 0.0
         assert page.top == 305.0
 
+    @staticmethod
+    def _word(left, right, bottom, top, text='x'):
+        w = Word()
+        w.add_character(Character(left, right, bottom, top, text=text))
+        return w
+
+    @pytest.fixture
+    def page(self):
+        page = Page(1, 0.0, 100.0, 0.0, 100.0)
+        for bottom in range(10, 90, 5):
+            page.add_word(self._word(10.0, 45.0, float(bottom), bottom + 4.0))
+            page.add_word(self._word(52.0, 90.0, float(bottom), bottom + 4.0))
+        return page
+
+    def test_compute_column_margins(self, page):
+        assert page.compute_column_margins() == (9.9, 45.1, 51.9, 90.1)
+
+    def test_languages_are_cached(self, page):
+        page.compute_column_margins()
+        english, french = page.english, page.french
+
+        assert [line.text for line in english] == ['x'] * 16
+        assert [line.text for line in french] == ['x'] * 16
+        assert page.english is english
+        assert page.french is french
+
+        page.add_word(self._word(12.0, 14.0, 5.0, 9.0, text='y'))
+        assert page.english is not english
+        assert page.english[-1].text == 'y'
+
+        page.right_edge = 80.0
+        assert page.french == []
+
+    def test_reuse_column_margins(self, page):
+        assert not page.reuse_column_margins((9.9, 45.1, 51.9, 95.0))
+        assert not page.reuse_column_margins((9.9, 46.0, 51.9, 90.1))
+        assert page.left_edge is None
+
+        assert page.reuse_column_margins((9.9, 45.1, 51.9, 90.1))
+        assert (page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge) == \
+            (9.9, 45.1, 51.9, 90.1)
+
+    def test_reuse_column_margins_with_break_in_column(self):
+        page = Page(1, 0.0, 100.0, 0.0, 100.0)
+        for bottom in range(10, 90, 5):
+            page.add_word(self._word(10.0, 20.0, float(bottom), bottom + 4.0))
+            page.add_word(self._word(21.0, 45.0, float(bottom), bottom + 4.0))
+            page.add_word(self._word(52.0, 90.0, float(bottom), bottom + 4.0))
+
+        assert not page.reuse_column_margins((9.9, 45.1, 51.9, 90.1))
+        assert page.compute_column_margins() == (20.9, 45.1, 51.9, 90.1)
+        assert page.reuse_column_margins((20.9, 45.1, 51.9, 90.1))
+        assert [len(line.words) for line in page.english] == [1] * 16
+
+    def test_remove_troublesome_lines(self, page):
+        page.add_word(self._word(20.0, 80.0, 97.0, 99.0, text='header'))
+        page.add_word(self._word(20.0, 80.0, 0.5, 5.0, text='footer'))
+        page.add_word(self._word(12.0, 15.0, 1.0, 3.0, text='folio'))
+        page.add_word(self._word(1.0, 2.0, 0.5, 99.5, text='rule'))
+        page.compute_column_margins()
+        page.remove_troublesome_lines()
+
+        assert [w.text for w in page.words] == ['x'] * 32
+
+    def test_words_in_region(self, page):
+        page.add_word(self._word(40.0, 60.0, 92.0, 95.0, text='header'))
+        page.add_word(self._word(5.0, 12.0, 3.0, 6.0, text='folio'))
+
+        assert [w.text for w in page.words_in_region(40.0, 60.0)] == ['header']
+        assert [w.text for w in page.words_in_region(44.0, 52.0, overlapping=True)] == ['x'] * 32 + ['header']
+        assert [w.text for w in page.words_in_region(top=6.0)] == ['folio']
+        assert [w.text for w in page.words_in_region(top=6.0, overlapping=True)] == ['folio']
+        assert [w.text for w in page.words_in_region(11.0, 45.0, top=6.0, overlapping=True)] == ['folio']
+        assert page.words_in_region(12.0, 45.0, bottom=10.0, top=14.0) == []
+        assert page.words_in_region(10.0, 45.0, bottom=10.0, top=14.0) == [page.words[0]]
+
+        region = page.words_in_region(right=50.0)
+        assert region == [w for w in page.words if w.right <= 50.0]
+
+        page.add_word(self._word(20.0, 30.0, 0.5, 1.0, text='late'))
+        assert page.words_in_region(top=1.0)[0].text == 'late'
+
+    def test_words_changed_in_place(self, page):
+        page.compute_column_margins()
+        assert len(page.english) == 16
+        assert len(page.words_in_region(bottom=85.0)) == 2
+
+        page.words.pop()
+        page.words.pop()
+        assert len(page.english) == 15
+        assert page.words_in_region(bottom=85.0) == []
+
+        page.words[0] = self._word(12.0, 14.0, 10.0, 14.0, text='y')
+        assert page.english[-1].text == 'y'
+        assert [w.text for w in page.words_in_region(right=14.0)] == ['y']
+
+        page = pickle.loads(pickle.dumps(page))
+        del page.words[0]
+        assert page.words_in_region(right=14.0) == []
+
 
 class TestLine(object):
 
@@ -140,6 +261,17 @@ class TestLine(object):
     def test_text(self, line):
         assert line.text == 'foo bars'
 
+    def test_sort_words(self, first_word, second_word):
+        test_line = Line()
+        test_line.add_word(second_word)
+        test_line.add_word(first_word)
+        test_line.sort_words()
+
+        assert test_line.text == 'foo bars'
+        assert (test_line.left, test_line.right) == (1.0, 1.8)
+        assert test_line.mean_size == (3 * first_word.mean_size + 4 * second_word.mean_size) / 7
+        assert test_line.mode_font == 'Arial'
+
     def test_can_add(self, line):
         third_word = Word()
         third_word.add_character(Character(1.9, 2.0, 10.05, 11.05, size=5.2, font='Arial', text='z'))
@@ -0,0 +1,110 @@
+import gzip
+import os
+import pytest
+from statuter import loader
+from statuter.block import Page
+from statuter.cache import PageCache, input_hash, pack_page, unpack_page
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return PageCache(str(tmpdir.join('cache')))
+
+
+def _snapshot(page):
+    return ([word.state() for word in page.words],
+            (page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge),
+            page.convert_to_markdown(page.english), page.convert_to_markdown(page.french))
+
+
+def test_pack_round_trip(layout_path):
+    page = loader.get_page(layout_path, 24)
+    restored = unpack_page(pack_page(page))
+
+    assert restored.page_no == page.page_no
+    assert _snapshot(restored) == _snapshot(page)
+
+
+def test_cached_pages_skip_parsing(layout_path, cache, monkeypatch):
+    expected = [_snapshot(page) for page in loader.iter_pages(layout_path, [23, 24], cache=cache)]
+
+    parsed = []
+    parse_pages = loader._parse_pages
+
+    def record_parse(source, page_numbers, *args):
+        parsed.extend(page_numbers)
+        return parse_pages(source, page_numbers, *args)
+
+    monkeypatch.setattr(loader, '_parse_pages', record_parse)
+    assert [_snapshot(page) for page in loader.iter_pages(layout_path, [23, 24, 25], cache=cache)] == expected
+    assert parsed == [25]
+
+
+def test_fully_cached_compressed_volume_is_not_parsed(layout_path, cache, monkeypatch):
+    compressed_path = layout_path + '.gz'
+    with open(layout_path, 'rb') as xml_file, gzip.open(compressed_path, 'wb') as compressed_file:
+        compressed_file.write(xml_file.read())
+    expected = [_snapshot(page) for page in loader.iter_pages(compressed_path, [23, 24], cache=cache)]
+
+    elements = []
+    start_element = loader.RscLoader.startElement
+
+    def record_element(content_loader, name, attrs):
+        elements.append(name)
+        start_element(content_loader, name, attrs)
+
+    monkeypatch.setattr(loader.RscLoader, 'startElement', record_element)
+    pages = loader.iter_pages(compressed_path, [23, 24], cache=cache)
+    assert [_snapshot(page) for page in pages] == expected
+    assert elements == []
+
+
+def test_cached_pages_are_unpacked_as_they_are_reached(layout_path, cache, monkeypatch):
+    expected = [_snapshot(page) for page in loader.iter_pages(layout_path, [23, 24], cache=cache)]
+
+    unpacked = []
+    get = cache.get
+
+    def record_get(source_hash, page_no):
+        unpacked.append(page_no)
+        return get(source_hash, page_no)
+
+    monkeypatch.setattr(cache, 'get', record_get)
+    pages = loader.iter_pages(layout_path, [23, 24], cache=cache)
+    assert _snapshot(next(pages)) == expected[0]
+    assert unpacked == [23]
+    assert [_snapshot(page) for page in pages] == expected[1:]
+
+
+def test_page_evicted_after_lookup_is_parsed(layout_path, cache, monkeypatch):
+    expected = [_snapshot(page) for page in loader.iter_pages(layout_path, [23, 24], cache=cache)]
+    monkeypatch.setattr(cache, 'get', lambda source_hash, page_no: None)
+    assert [_snapshot(page) for page in loader.iter_pages(layout_path, [23, 24], cache=cache)] == \
+        expected
+
+
+def test_layout_parameters_are_part_of_the_key(layout_path, cache, monkeypatch):
+    page = loader.get_page(layout_path, 24, cache=cache)
+    assert cache.get(input_hash(layout_path), 24) is not None
+
+    monkeypatch.setattr(Page, 'GAP_RANGE_FRACTION', 0.3)
+    assert cache.get(input_hash(layout_path), 24) is None
+
+    cache.put('other', page)
+    monkeypatch.undo()
+    assert cache.get('other', 24) is None
+
+
+def test_evict_least_recently_used(layout_path, cache):
+    page = loader.get_page(layout_path, 24)
+    for source_hash in ('a', 'b', 'c'):
+        cache.put(source_hash, page)
+    os.utime(cache._entry_path('a', 24), (1, 1))
+    os.utime(cache._entry_path('b', 24), (2, 2))
+
+    cache.max_bytes = 2 * os.path.getsize(cache._entry_path('c', 24))
+    cache.evict()
+
+    assert cache.get('a', 24) is None
+    assert cache.get('b', 24) is not None
+    assert cache.get('c', 24) is not None
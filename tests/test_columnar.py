@@ -0,0 +1,63 @@
+import pytest
+from statuter import loader
+from statuter.block import LINE_KINDS
+from statuter.columnar import export_columns, load_columns, npy_bytes, npy_strings, read_npy
+
+
+def test_npy_round_trip():
+    for values, kind in (([1.5, -2.25], 'float64'), ([3, -4], 'int32'), ([2 ** 40], 'int64'),
+                         ([0, 255], 'uint8'), ([], 'int8')):
+        data = npy_bytes(values, kind)
+        assert read_npy(data) == values
+        assert (len(data) - len(values) * {'float64': 8, 'int64': 8, 'int32': 4}.get(kind, 1)) % 64 == 0
+    assert read_npy(npy_strings(['Courier', 'Times-Roman', ''])) == ['Courier', 'Times-Roman', '']
+
+
+@pytest.mark.parametrize('name', ['volume.npz', 'volume'])
+def test_export_columns(layout_path, tmpdir, name):
+    path = str(tmpdir.join(name))
+    export_columns(layout_path, path)
+    columns = load_columns(path)
+
+    page = loader.get_page(layout_path, 24)
+    lines = page.english + page.french
+    assert columns['line_page'] == [24] * len(lines)
+    assert columns['line_language'] == [0] * len(page.english) + [1] * len(page.french)
+    assert columns['line_line'] == list(range(len(page.english))) + list(range(len(page.french)))
+    assert columns['line_left'] == [line.left for line in lines]
+    assert columns['line_mean_size'] == [line.mean_size for line in lines]
+    assert [columns['line_kinds'][kind] for kind in columns['line_kind']] == \
+        [page.classify_line(line) for line in lines]
+    assert [columns['fonts'][font] for font in columns['line_mode_font']] == \
+        [line.mode_font for line in lines]
+
+    data, offsets = bytes(columns['line_text_data']), columns['line_text_offsets']
+    assert [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(lines))] == \
+        [line.text for line in lines]
+
+    words = [word for line in lines for word in line.words]
+    assert len(columns['word_page']) == len(words)
+    assert columns['word_top'] == [word.top for word in words]
+    assert columns['word_word'][:3] == [0, 1, 2]
+    assert columns['languages'] == ['eng', 'fra']
+
+
+def test_classify_line(layout_path):
+    page = loader.get_page(layout_path, 24)
+    kinds = [page.classify_line(line) for line in page.english]
+    assert set(kinds) <= set(LINE_KINDS)
+    for line, kind in zip(page.english, kinds):
+        markdown = page.convert_to_markdown([line])
+        assert markdown.lstrip().startswith('# ') == (kind == 'header_1')
+        assert markdown.lstrip().startswith('## ') == (kind == 'header_2')
+
+
+def test_numpy_reads_export(layout_path, tmpdir):
+    numpy = pytest.importorskip('numpy')
+    path = str(tmpdir.join('volume.npz'))
+    export_columns(layout_path, path)
+
+    expected = load_columns(path)
+    with numpy.load(path) as arrays:
+        for name, values in expected.items():
+            assert arrays[name].tolist() == values
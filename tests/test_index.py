@@ -0,0 +1,83 @@
+import json
+import os
+import pytest
+from statuter import index as page_index, loader
+from statuter.index import PageIndex, PageStatistics, INDEX_SUFFIX
+
+
+def test_build(layout_path):
+    index = PageIndex.build(layout_path)
+
+    assert [page_id for page_id, _, _ in index.pages] == ['23', '24']
+    assert 24 in index
+    assert 25 not in index
+
+    start, end = index.offsets(24)
+    with open(layout_path, 'rb') as xml_file:
+        xml_file.seek(start)
+        assert xml_file.read(end - start).startswith(b'<page id="24"')
+        xml_file.seek(0)
+        assert xml_file.read(index.header_end).rstrip().endswith(b'<pages>')
+
+
+def test_page_statistics(layout_path):
+    index = PageIndex.build(layout_path)
+
+    assert index.stats['23'] == PageStatistics(10, (0.0, 0.0, 306.0, 397.0),
+                                               (86.474, 259.261, 117.373, 264.679))
+    assert index.stats['24'].text_extents == (0.479, 21.59, 290.802, 381.209)
+    page = loader.get_page(layout_path, 24, use_index=False)
+    assert index.stats['24'].characters >= sum(word.num_chars for word in page.words)
+
+
+def test_for_file_writes_sidecar(layout_path):
+    index = PageIndex.for_file(layout_path)
+    assert os.path.exists(layout_path + INDEX_SUFFIX)
+    assert PageIndex.load(layout_path).pages == index.pages
+    assert PageIndex.load(layout_path).stats == index.stats
+
+
+def test_unwritable_sidecar_falls_back_to_cache_dir(layout_path, tmpdir, monkeypatch):
+    cache_dir = str(tmpdir.join('cache'))
+    monkeypatch.setattr(page_index, 'INDEX_CACHE_DIR', cache_dir)
+    os.mkdir(layout_path + INDEX_SUFFIX)
+
+    index = PageIndex.for_file(layout_path)
+    assert len(os.listdir(cache_dir)) == 1
+    monkeypatch.setattr(PageIndex, 'build', None)
+    assert PageIndex.for_file(layout_path).pages == index.pages
+
+
+def test_unsaved_index_warns(layout_path, tmpdir, monkeypatch):
+    tmpdir.join('cache').write('')
+    monkeypatch.setattr(page_index, 'INDEX_CACHE_DIR', str(tmpdir.join('cache')))
+    os.mkdir(layout_path + INDEX_SUFFIX)
+
+    with pytest.warns(RuntimeWarning, match='Could not save the page index'):
+        PageIndex.for_file(layout_path)
+
+
+def test_sidecar_without_statistics_is_ignored(layout_path):
+    index = PageIndex.build(layout_path)
+    with open(layout_path + INDEX_SUFFIX, 'w') as index_file:
+        json.dump({'size': index.size, 'mtime': index.mtime, 'header_end': index.header_end,
+                   'pages': index.pages}, index_file)
+
+    assert PageIndex.load(layout_path) is None
+
+
+def test_stale_sidecar_is_ignored(layout_path):
+    PageIndex.for_file(layout_path)
+    with open(layout_path, 'ab') as xml_file:
+        xml_file.write(b'\n')
+
+    assert PageIndex.load(layout_path) is None
+    assert PageIndex.for_file(layout_path).size == os.path.getsize(layout_path)
+
+
+def test_indexed_page_matches_full_parse(layout_path):
+    indexed = loader.get_page(layout_path, 24)
+    scanned = loader.get_page(layout_path, 24, use_index=False)
+
+    assert [w.text for w in indexed.words] == [w.text for w in scanned.words]
+    assert (indexed.left_edge, indexed.right_edge) == (scanned.left_edge, scanned.right_edge)
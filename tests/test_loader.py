@@ -1,16 +1,12 @@
-import os
+import gzip
 import pytest
+import threading
+import time
 from statuter import loader
-
-
-@pytest.fixture
-def content_path():
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tests/content_fixture.xml')
-
-
-@pytest.fixture
-def layout_path():
-    return os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tests/layout_fixture.xml')
+from statuter.block import Character, LayoutTemplate, Word
+from statuter.cache import PageCache, input_hash
+from statuter.index import PageIndex
+from statuter.profiler import Profiler
 
 
 def test_content(content_path):
@@ -54,3 +50,264 @@ def test_convert_to_markdown(content_path):
     english = page.english[6:9]
     markdown = page.convert_to_markdown(english)
     assert markdown == '\n## CONSTITUTION OF COURT\n\n**3.** (1) The Exchequer Court of Canada\ncontinues to be a Court of Admiralty and to\n'
+
+
+def test_iter_pages(layout_path):
+    pages = list(loader.iter_pages(layout_path, range(23, 26)))
+
+    assert [page.page_no for page in pages] == ['23', '24']
+    assert pages[0].words == []
+    assert [w.text for w in pages[1].words] == [w.text for w in loader.get_page(layout_path, 24).words]
+
+
+def test_iter_pages_skips_unrequested_pages(layout_path):
+    pages = list(loader.iter_pages(layout_path, [24]))
+    assert [page.page_no for page in pages] == ['24']
+
+
+def test_render_pages_in_process_pool(layout_path):
+    serial = list(loader.render_pages(layout_path, range(23, 25)))
+    parallel = list(loader.render_pages(layout_path, range(23, 25), workers=2, max_in_flight=1))
+
+    assert [page_no for page_no, _, _ in serial] == ['23', '24']
+    assert parallel == serial
+
+
+def test_extract_pages(content_path, tmpdir):
+    english_output, french_output = str(tmpdir.join('eng.md')), str(tmpdir.join('fra.md'))
+    loader.extract_pages(content_path, english_output, french_output, range(24, 25), workers=2)
+
+    page = loader.get_page(content_path, 24)
+    with open(english_output) as english_file:
+        assert english_file.read() == page.convert_to_markdown(page.english)
+    with open(french_output) as french_file:
+        assert french_file.read() == page.convert_to_markdown(page.french)
+
+
+def test_extract_acts_shares_pages(layout_path, tmpdir):
+    acts = [
+        (str(tmpdir.join('eng_a.md')), str(tmpdir.join('fra_a.md')), range(23, 25)),
+        (str(tmpdir.join('eng_b.md')), str(tmpdir.join('fra_b.md')), range(24, 25)),
+        (str(tmpdir.join('eng_c.md')), str(tmpdir.join('fra_c.md')), range(30, 31)),
+    ]
+    loader.extract_acts(layout_path, acts)
+
+    page = loader.get_page(layout_path, 24)
+    for english_output, french_output, _ in acts[:2]:
+        with open(english_output) as english_file:
+            assert english_file.read() == page.convert_to_markdown(page.english)
+        with open(french_output) as french_file:
+            assert french_file.read() == page.convert_to_markdown(page.french)
+
+    assert tmpdir.join('eng_c.md').read() == ''
+    assert tmpdir.join('fra_c.md').read() == ''
+
+
+@pytest.mark.parametrize('backend', ['expat', 'lxml'])
+def test_backends_match_sax(content_path, backend):
+    if backend == 'lxml':
+        pytest.importorskip('lxml')
+
+    expected = loader.get_page(content_path, 24)
+    page = loader.get_page(content_path, 24, backend=backend)
+
+    assert [(w.text, w.left, w.top, w.mean_size) for w in page.words] == \
+        [(w.text, w.left, w.top, w.mean_size) for w in expected.words]
+    assert page.convert_to_markdown(page.english) == expected.convert_to_markdown(expected.english)
+    assert page.convert_to_markdown(page.french) == expected.convert_to_markdown(expected.french)
+
+
+def test_unknown_backend(content_path):
+    with pytest.raises(ValueError):
+        loader.get_page(content_path, 24, backend='html')
+
+
+def test_stream_pages_yields_markdown_line_by_line(content_path):
+    page = loader.get_page(content_path, 24)
+    (page_no, english_chunks, french_chunks), = list(loader.stream_pages(content_path, [24]))
+
+    english_chunks = list(english_chunks)
+    assert page_no == '24'
+    assert len(english_chunks) == len(page.english)
+    assert english_chunks[7] == '\n**3.** (1) The Exchequer Court of Canada\n'
+    assert ''.join(english_chunks) == page.convert_to_markdown(page.english)
+    assert ''.join(french_chunks) == page.convert_to_markdown(page.french)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_pages_profile(layout_path, workers):
+    profiler = Profiler()
+    rendered = list(loader.render_pages(layout_path, [23, 24], workers, profiler=profiler))
+    report = profiler.report(slowest=1)
+
+    assert [page_no for page_no, _, _ in rendered] == ['23', '24']
+    assert report['pages'] == 2
+    assert [record['page'] for record in report['page_details']] == ['23', '24']
+    assert report['slowest_pages'][0]['page'] == '24'
+    assert report['total_counts']['blank_pages'] == 1
+    assert len(report['slowest_pages']) == 1
+    for stage in ('parse', 'compute_column_margins', 'remove_troublesome_lines', 'extract_language', 'markdown'):
+        assert report['total_seconds'][stage] > 0
+    assert report['total_counts']['words'] >= report['total_counts']['lines'] > 0
+    assert report['total_counts']['characters'] > report['total_counts']['words']
+
+
+def test_layout_template_reuses_margins(layout_path, content_path):
+    template = LayoutTemplate()
+    assert not template.apply(loader.get_page(layout_path, 24))
+
+    page = loader.get_page(layout_path, 24)
+    assert template.apply(page)
+    margins = (page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge)
+    assert margins == loader.get_page(layout_path, 24).compute_column_margins()
+
+    page = loader.get_page(content_path, 24)
+    template.apply(page)
+    margins = (page.left_edge, page.left_gap_edge, page.right_gap_edge, page.right_edge)
+    assert margins == loader.get_page(content_path, 24).compute_column_margins()
+    assert template.hits + template.misses == 3
+
+
+def test_reuse_column_margins_with_word_across_gap(layout_path):
+    margins = loader.get_page(layout_path, 24).compute_column_margins()
+    page = loader.get_page(layout_path, 24)
+    bottom, _ = page._vertical_range_adjustment()
+
+    word = Word()
+    word.add_character(Character(margins[1] - 1, margins[2] + 1, bottom, bottom + 5, text='x'))
+    page.add_word(word)
+
+    assert not page.reuse_column_margins(margins)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_render_pages_layout_template(layout_path, workers):
+    template = LayoutTemplate()
+    rendered = list(loader.render_pages(layout_path, [23, 24], workers, layout_template=template))
+
+    assert rendered == list(loader.render_pages(layout_path, [23, 24]))
+    assert (template.hits, template.misses) == (0, 1)
+
+
+@pytest.mark.parametrize('queue_size', [0, 1, 16])
+def test_extract_pages_pipeline(layout_path, tmpdir, queue_size):
+    english_output, french_output = str(tmpdir.join('eng.md')), str(tmpdir.join('fra.md'))
+    loader.extract_pages(layout_path, english_output, french_output, range(23, 25),
+                         queue_size=queue_size)
+
+    rendered = list(loader.render_pages(layout_path, range(23, 25)))
+    with open(english_output) as english_file:
+        assert english_file.read() == ''.join(english for _, english, _ in rendered)
+    with open(french_output) as french_file:
+        assert french_file.read() == ''.join(french for _, _, french in rendered)
+
+
+def test_threaded_raises_errors_and_stops_when_closed():
+    produced = []
+
+    def items():
+        for item in range(100):
+            produced.append(item)
+            if item == 50:
+                raise ValueError('bad page')
+            yield item
+
+    threaded = loader._threaded(items(), 2)
+    assert next(threaded) == 0
+    threaded.close()
+    assert len(produced) <= 5
+
+    with pytest.raises(ValueError):
+        list(loader._threaded(items(), 2))
+
+
+def test_extract_pages_stops_pipeline_when_layout_fails(layout_path, tmpdir, monkeypatch):
+    def fail(*args):
+        raise ValueError('bad page')
+
+    monkeypatch.setattr(loader, '_layout_page', fail)
+    english_output, french_output = str(tmpdir.join('eng.md')), str(tmpdir.join('fra.md'))
+    with pytest.raises(ValueError):
+        loader.extract_pages(layout_path, english_output, french_output, range(23, 25))
+    assert not [thread for thread in threading.enumerate() if thread.name == 'statuter-pipeline']
+
+
+def test_sparse_pages_are_not_parsed(layout_path, tmpdir):
+    with open(layout_path, 'rb') as xml_file:
+        data = xml_file.read()
+    start, end = data.index(b'<page id="23"'), data.index(b'<page id="24"')
+    lines = data[start:end].split(b'\n')
+    texts = [line_no for line_no, line in enumerate(lines) if b'<text ' in line]
+    sparse_page = b'\n'.join(line for line_no, line in enumerate(lines) if line_no not in texts[5:])
+    path = str(tmpdir.join('sparse.xml'))
+    with open(path, 'wb') as xml_file:
+        xml_file.write(data[:start] + sparse_page + data[end:])
+
+    profiler = Profiler()
+    rendered = list(loader.render_pages(path, [23, 24], profiler=profiler))
+    assert profiler.report()['total_counts']['skipped_pages'] == 1
+    assert rendered[0] == ('23', '', '')
+
+    indexed = list(loader.iter_pages(path, [23, 24]))
+    scanned = list(loader.iter_pages(path, [23, 24], use_index=False))
+    assert [page.page_no for page in indexed] == [page.page_no for page in scanned] == ['23', '24']
+    assert indexed[0].words == scanned[0].words == []
+    assert (indexed[0].left, indexed[0].right, indexed[0].bottom, indexed[0].top) == \
+        (scanned[0].left, scanned[0].right, scanned[0].bottom, scanned[0].top)
+
+
+def test_render_chunks(layout_path, tmpdir):
+    index = PageIndex.for_file(layout_path)
+    page, english, french = loader.render_chunks(index.read_chunks([24]), 24)
+    assert (page.page_no, english, french) == next(loader.render_pages(layout_path, [24]))
+    assert loader.render_chunks(index.read_chunks([24]), 30) is None
+
+    cache = PageCache(str(tmpdir.join('cache')))
+    source_hash = input_hash(layout_path)
+    loader.render_chunks(index.read_chunks([24]), 24, cache=cache, source_hash=source_hash)
+    page, cached_english, _ = loader.render_chunks(iter([]), 24, cache=cache,
+                                                   source_hash=source_hash, profile=True)
+    assert cached_english == english
+    assert page.stats.counts['cached_pages'] == 1
+
+
+def test_parse_time_excludes_time_between_feeds(layout_path, monkeypatch):
+    compressed_path = layout_path + '.gz'
+    with open(layout_path, 'rb') as xml_file, gzip.open(compressed_path, 'wb') as compressed_file:
+        compressed_file.write(xml_file.read())
+    layout_page = loader._layout_page
+
+    def slow_layout(*args):
+        time.sleep(0.2)
+        return layout_page(*args)
+
+    monkeypatch.setattr(loader, '_layout_page', slow_layout)
+    monkeypatch.setattr(loader.sources, 'READ_BUFFER_SIZE', 4096)
+    profiler = Profiler()
+    list(loader.render_pages(compressed_path, [23, 24], profiler=profiler))
+    assert [stats.seconds['parse'] < 0.2 for _, stats in profiler.pages] == [True, True]
+
+
+def test_index_page_missing_from_parse_raises(layout_path, tmpdir):
+    with open(layout_path, 'rb') as xml_file:
+        data = xml_file.read()
+    start, end = data.index(b'<page id="24"'), data.index(b'</page>', data.index(b'<page id="24"'))
+    page = data[start:end + len(b'</page>')]
+    path = str(tmpdir.join('duplicate.xml'))
+    with open(path, 'wb') as xml_file:
+        xml_file.write(data[:start] + page + b'\n' + page + data[end + len(b'</page>'):])
+
+    with pytest.raises(ValueError):
+        list(loader.iter_pages(path, [24]))
+
+
+def test_extract_pages_with_reference_engine(layout_path, tmpdir):
+    english_output, french_output = str(tmpdir.join('eng.md')), str(tmpdir.join('fra.md'))
+    loader.extract_pages(layout_path, english_output, french_output, range(23, 25),
+                         use_reference=True)
+
+    rendered = list(loader.render_pages(layout_path, range(23, 25)))
+    with open(english_output) as english_file:
+        assert english_file.read() == ''.join(english for _, english, _ in rendered)
+    with open(french_output) as french_file:
+        assert french_file.read() == ''.join(french for _, _, french in rendered)
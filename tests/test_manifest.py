@@ -0,0 +1,90 @@
+import gzip
+import os
+import pytest
+from statuter.block import Line, Page
+from statuter.manifest import Manifest, extract_changed_acts, page_hashes, _streamed_page_hashes
+
+
+@pytest.fixture
+def acts(tmpdir):
+    tmpdir.mkdir('eng')
+    tmpdir.mkdir('fra')
+    return [(str(tmpdir.join('eng', name + '.md')), str(tmpdir.join('fra', name + '.md')), pages)
+            for name, pages in (('A-1', [23]), ('A-2', [24]), ('A-3', [23, 24]))]
+
+
+def _edit_page_24(path):
+    with open(path, 'rb') as xml_file:
+        data = xml_file.read()
+    page_start = data.index(b'<page id="24"')
+    data = data[:page_start] + data[page_start:].replace(b'>C</text>', b'>D</text>', 1)
+    with open(path, 'wb') as xml_file:
+        xml_file.write(data)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_page_hashes_match_across_compression(layout_path, tmpdir):
+    hashes = page_hashes(layout_path)
+    assert sorted(hashes) == ['23', '24']
+
+    compressed_path = str(tmpdir.join('layout_fixture.xml.gz'))
+    with open(layout_path, 'rb') as xml_file, gzip.open(compressed_path, 'wb') as compressed_file:
+        compressed_file.write(xml_file.read())
+    assert page_hashes(compressed_path) == hashes
+
+    with open(layout_path, 'rb') as xml_file:
+        data = xml_file.read()
+    tiny_chunks = (data[i:i + 7] for i in range(0, len(data), 7))
+    assert _streamed_page_hashes(tiny_chunks) == hashes
+
+
+def test_only_changed_acts_are_rewritten(layout_path, acts, tmpdir):
+    manifest_file = str(tmpdir.join('eng.manifest.json'))
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts
+    outputs = {}
+    for english_output, french_output, _ in acts:
+        with open(english_output) as english_file, open(french_output) as french_file:
+            outputs[english_output] = (english_file.read(), french_file.read())
+
+    assert extract_changed_acts(layout_path, acts, manifest_file) == []
+
+    _edit_page_24(layout_path)
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts[1:]
+    with open(acts[0][0]) as english_file:
+        assert english_file.read() == outputs[acts[0][0]][0]
+    with open(acts[2][0]) as english_file:
+        assert english_file.read() != outputs[acts[2][0]][0]
+
+    os.remove(acts[0][1])
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts[:1]
+    assert extract_changed_acts(layout_path, acts, manifest_file, rebuild=True) == acts
+
+
+@pytest.mark.parametrize('cls, constant, value', [
+    (Line, 'MIN_VERTICAL_OVERLAP_FRACTION', 0.9),
+    (Page, 'HEADER_2_THRESHOLD_SIZE', 5.5),
+])
+def test_changed_render_parameters_rewrite_acts(layout_path, acts, tmpdir, monkeypatch, cls,
+                                                constant, value):
+    manifest_file = str(tmpdir.join('eng.manifest.json'))
+    extract_changed_acts(layout_path, acts, manifest_file)
+
+    monkeypatch.setattr(cls, constant, value)
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts
+
+
+def test_changed_page_lists_are_rewritten(layout_path, acts, tmpdir):
+    manifest_file = str(tmpdir.join('eng.manifest.json'))
+    extract_changed_acts(layout_path, acts, manifest_file)
+
+    acts[0] = (acts[0][0], acts[0][1], [23, 24])
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts[:1]
+    assert Manifest.load(manifest_file).acts[os.path.join('eng', 'A-1.md')]['pages'] == ['23', '24']
+
+
+def test_unreadable_manifest_rebuilds(layout_path, acts, tmpdir):
+    manifest_file = str(tmpdir.join('eng.manifest.json'))
+    with open(manifest_file, 'w') as broken_file:
+        broken_file.write('{')
+    assert extract_changed_acts(layout_path, acts, manifest_file) == acts
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+from statuter import loader
+from statuter.server import PageServer, parse_page_range
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_parse_page_range():
+    assert list(parse_page_range('23-25')) == [23, 24, 25]
+    assert list(parse_page_range('24')) == [24]
+    with pytest.raises(ValueError):
+        parse_page_range('25-23')
+
+
+def test_render_caches_pages(layout_path, loop):
+    page_server = PageServer(layout_path, max_pages=1)
+    try:
+        expected = list(loader.render_pages(layout_path, [23, 24]))
+        assert loop.run_until_complete(page_server.render(range(22, 26))) == expected
+        assert (page_server.hits, page_server.misses) == (0, 2)
+
+        assert loop.run_until_complete(page_server.render([24])) == expected[1:]
+        assert loop.run_until_complete(page_server.render([23])) == expected[:1]
+        assert (page_server.hits, page_server.misses) == (1, 3)
+    finally:
+        page_server.close()
+
+
+def test_concurrent_requests_share_a_parse(layout_path, loop):
+    page_server = PageServer(layout_path)
+
+    async def requests():
+        return await asyncio.gather(page_server.render([23, 24]), page_server.render([24]))
+
+    try:
+        first, second = loop.run_until_complete(requests())
+        assert first[1:] == second
+        assert (page_server.hits, page_server.misses) == (1, 2)
+    finally:
+        page_server.close()
+
+
+def test_unix_socket_protocol(layout_path, loop, tmpdir):
+    socket_path = str(tmpdir.join('statuter.sock'))
+    page_server = PageServer(layout_path)
+
+    async def session():
+        server = await page_server.start(socket_path)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        responses = []
+        for request in (b'{"pages": "23-24"}\n', b'{"pages": "x"}\n', b'{"command": "stats"}\n'):
+            writer.write(request)
+            responses.append(json.loads((await reader.readline()).decode('utf-8')))
+        writer.write_eof()
+        assert await reader.read() == b''
+        writer.close()
+        await asyncio.sleep(0)
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    try:
+        pages, error, stats = loop.run_until_complete(session())
+    finally:
+        page_server.close()
+
+    english = ''.join(english_markdown for _, english_markdown, _ in loader.render_pages(layout_path, [23, 24]))
+    assert pages['ok'] and pages['pages'] == ['23', '24']
+    assert pages['eng'] == english
+    assert not error['ok'] and error['error'].startswith('ValueError')
+    assert stats == {'ok': True, 'pages_cached': 2, 'hits': 0, 'misses': 2}
+
+
+def test_compressed_input_is_rejected(tmpdir):
+    path = str(tmpdir.join('volume.xml.gz'))
+    with open(path, 'wb') as compressed_file:
+        compressed_file.write(b'\x1f\x8b\x08\x00')
+    with pytest.raises(ValueError):
+        PageServer(path)
+
+
+def test_layout_error_is_reported(layout_path, loop, tmpdir, monkeypatch):
+    def fail(*args):
+        raise AssertionError("Couldn't find middle gap on page 24")
+
+    monkeypatch.setattr('statuter.server.render_chunks', fail)
+    socket_path = str(tmpdir.join('statuter.sock'))
+    page_server = PageServer(layout_path)
+
+    async def session():
+        server = await page_server.start(socket_path)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        responses = []
+        for request in (b'{"pages": "24"}\n', b'{"command": "stats"}\n'):
+            writer.write(request)
+            responses.append(json.loads((await reader.readline()).decode('utf-8')))
+        writer.write_eof()
+        assert await reader.read() == b''
+        writer.close()
+        await asyncio.sleep(0)
+        server.close()
+        await server.wait_closed()
+        return responses
+
+    try:
+        error, stats = loop.run_until_complete(session())
+    finally:
+        page_server.close()
+
+    assert error == {'ok': False, 'error': "AssertionError: Couldn't find middle gap on page 24"}
+    assert stats['ok']
@@ -0,0 +1,59 @@
+import bz2
+import gzip
+import io
+import lzma
+import pytest
+from statuter import loader, sources
+
+
+@pytest.fixture
+def layout_bytes(layout_path):
+    with open(layout_path, 'rb') as xml_file:
+        return xml_file.read()
+
+
+def _zstd_compress(data):
+    zstandard = pytest.importorskip('zstandard')
+    return zstandard.ZstdCompressor().compress(data)
+
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'bzip2': bz2.compress,
+    'xz': lzma.compress,
+    'zstd': _zstd_compress,
+}
+
+
+def _words(pages):
+    return [[w.text for w in page.words] for page in pages]
+
+
+def test_iter_chunks_reads_plain_file(layout_path, layout_bytes):
+    assert sources.is_plain_file(layout_path)
+    assert b''.join(sources.iter_chunks(layout_path)) == layout_bytes
+
+
+@pytest.mark.parametrize('name', sorted(COMPRESSORS))
+def test_compressed_path(name, layout_path, layout_bytes, tmpdir):
+    path = str(tmpdir.join('layout_fixture.xml.' + name))
+    with open(path, 'wb') as compressed_file:
+        compressed_file.write(COMPRESSORS[name](layout_bytes))
+
+    assert sources.compression(path) == name
+    assert not sources.is_plain_file(path)
+    assert b''.join(sources.iter_chunks(path)) == layout_bytes
+    assert _words(loader.iter_pages(path, [23, 24])) == _words(loader.iter_pages(layout_path, [23, 24]))
+
+
+def test_multi_member_gzip(layout_bytes):
+    half = len(layout_bytes) // 2
+    stream = io.BytesIO(gzip.compress(layout_bytes[:half]) + gzip.compress(layout_bytes[half:]))
+    assert b''.join(sources.iter_chunks(stream)) == layout_bytes
+
+
+def test_file_objects(layout_path, layout_bytes):
+    expected = _words(loader.iter_pages(layout_path, [24]))
+
+    assert _words(loader.iter_pages(io.BytesIO(layout_bytes), [24])) == expected
+    assert _words(loader.iter_pages(io.BytesIO(gzip.compress(layout_bytes)), [24])) == expected
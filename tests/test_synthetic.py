@@ -0,0 +1,37 @@
+import pytest
+from statuter import loader, synthetic
+
+
+@pytest.fixture
+def volume_path(tmpdir):
+    return synthetic.write_volume(str(tmpdir.join('volume.xml')), pages=3, chars_per_page=2000,
+                                  fonts=('Courier', 'Times-Roman'))
+
+
+def test_pages_are_laid_out_in_two_columns(volume_path):
+    pages = list(loader.iter_pages(volume_path, range(1, 4)))
+    assert [page.page_no for page in pages] == ['1', '2', '3']
+
+    for page in pages:
+        assert page.left_edge < synthetic.ENGLISH_COLUMN[0] < page.left_gap_edge
+        assert page.right_gap_edge < synthetic.FRENCH_COLUMN[0] < page.right_edge
+        assert len(page.english) > 10
+        assert len(page.french) > 10
+        assert set(w.mode_font for w in page.words) == {'Courier', 'Times-Roman'}
+
+
+def test_running_headers_are_removed(volume_path):
+    page = loader.get_page(volume_path, 2)
+    texts = [w.text for w in page.words]
+    assert 'Admiralty/Amiraute' not in texts
+    assert '2' not in texts
+
+
+def test_characters_per_page(tmpdir):
+    rng = synthetic.random.Random(0)
+    with open(str(tmpdir.join('page.xml')), 'w') as output:
+        sparse = synthetic.write_page(output, 1, rng, chars_per_page=500, running_headers=False)
+        dense = synthetic.write_page(output, 2, rng, chars_per_page=8000, running_headers=False)
+
+    assert 400 <= sparse <= 600
+    assert 6500 <= dense <= 8500
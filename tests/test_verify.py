@@ -0,0 +1,29 @@
+from statuter import block, loader, reference
+from statuter.cache import PageCache, input_hash
+from statuter.verify import FAST, REFERENCE, PageDifference, compare_engines, engine_pages
+
+
+def test_engines_agree(layout_path):
+    pages = list(engine_pages(layout_path, [23, 24], REFERENCE))
+    assert [page.page_no for page in pages] == ['23', '24']
+    assert all(isinstance(page, reference.Page) for page in pages)
+    assert list(compare_engines(layout_path)) == []
+    assert list(compare_engines(layout_path, [24], FAST._replace(backend='sax'))) == []
+
+
+def test_reports_differing_pages(layout_path, tmpdir):
+    cache = PageCache(str(tmpdir.join('cache')))
+    page = loader.get_page(layout_path, 24)
+    page.right_edge += 1
+    page.words.pop()
+    cache.put(input_hash(layout_path), page)
+
+    differences = list(compare_engines(layout_path, [23, 24], cache=cache))
+    assert differences == [PageDifference('24', ('margins', 'words'))]
+
+
+def test_reference_engine_is_independent_of_the_optimized_code(layout_path, monkeypatch):
+    monkeypatch.setattr(block.Page, 'HEADER_2_THRESHOLD_SIZE', 0.0)
+    monkeypatch.setattr(block.Page, 'HEADER_CAP_THRESHOLD', 0.0)
+
+    assert list(compare_engines(layout_path, [24])) == [PageDifference('24', ('eng', 'fra'))]